@@ -1,6 +1,11 @@
+import time
+
+_process_start = time.perf_counter()
+
 import streamlit as st
 import sys
 import os
+import itertools
 
 # Set environment variables to avoid warnings
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -8,7 +13,9 @@ os.environ["TOKENIZERS_PARALLELISM"] = "false"
 # Add the project root to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from pipeline.pipeline import YuGiOhRecommendationPipeline
+# Only the lightweight loader is imported here; langchain, chromadb and torch load in its thread
+from pipeline.warm_start import BackgroundPipeline
+from config.config import BACKGROUND_STARTUP
 from dotenv import load_dotenv
 
 st.set_page_config(page_title="Yu-Gi-Oh! Card Recommender", layout="wide")
@@ -17,17 +24,22 @@ load_dotenv()
 
 @st.cache_resource
 def init_pipeline():
-    try:
-        return YuGiOhRecommendationPipeline()
-    except Exception as e:
-        st.error(f"Failed to initialize Yu-Gi-Oh! pipeline: {str(e)}")
-        st.info("💡 Make sure you've built the vector store first by running: `python pipeline/build_pipeline.py`")
-        return None
+    loader = BackgroundPipeline(warm_up=True)
+    loader.timings["app_import_seconds"] = round(time.perf_counter() - _process_start, 3)
+    loader.start()
+    if not BACKGROUND_STARTUP:
+        # Eager mode: block the first page until the model is loaded, as before
+        try:
+            loader.wait()
+        except Exception:
+            pass
+    return loader
 
-pipeline = init_pipeline()
+loader = init_pipeline()
 
-if pipeline is None:
-    st.error("❌ Failed to initialize the Yu-Gi-Oh! recommendation system.")
+if loader.status == "failed":
+    st.error(f"❌ Failed to initialize the Yu-Gi-Oh! recommendation system: {str(loader.error)}")
+    st.info("💡 Make sure you've built the vector store first by running: `python pipeline/build_pipeline.py`")
     st.stop()
 
 st.title("🃏 Yu-Gi-Oh! Card Recommender System")
@@ -60,19 +72,36 @@ query_examples = [
     "Fusion summoning support cards"
 ]
 
+if loader.status == "warming_up":
+    st.info("⏳ Warming up the card search model... You can already type a query, it runs as soon as the model is ready.")
+
 query = st.text_input(
     "Enter your card preferences:",
     placeholder="e.g., Powerful dragon monsters with high attack points"
 )
 
 if query:
-    with st.spinner("🔍 Finding the perfect cards for your deck..."):
-        try:
-            response = pipeline.recommend(query)
-            st.markdown("### 🎴 Recommended Cards")
-            st.write(response)
-        except Exception as e:
-            st.error(f"❌ Error getting recommendations: {str(e)}")
-            st.info("💡 Make sure you've built the vector store first by running: `python pipeline/build_pipeline.py`")
+    try:
+        if loader.status == "warming_up":
+            with st.spinner("⏳ Still warming up the card search model..."):
+                loader.wait()
+        pipeline = loader.wait()
+
+        start = time.perf_counter()
+        stream = pipeline.recommend_stream(query)
+        # The spinner only covers retrieval and the wait for the first token, the rest renders as it arrives
+        with st.spinner("🔍 Finding the perfect cards for your deck..."):
+            first_chunk = next(stream, "")
+        loader.timings.setdefault("first_query_first_chunk_seconds", round(time.perf_counter() - start, 3))
+        st.markdown("### 🎴 Recommended Cards")
+        st.write_stream(itertools.chain([first_chunk], stream))
+        loader.timings.setdefault("first_query_seconds", round(time.perf_counter() - start, 3))
+    except Exception as e:
+        st.error(f"❌ Error getting recommendations: {str(e)}")
+        st.info("💡 Make sure you've built the vector store first by running: `python pipeline/build_pipeline.py`")
+
+if loader.status == "ready":
+    with st.sidebar.expander("⏱️ Startup timings"):
+        st.json(loader.timings)
 
 
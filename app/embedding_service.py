@@ -0,0 +1,44 @@
+import asyncio
+import sys
+import os
+
+# Set environment variables to avoid warnings
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import EMBEDDING_MODEL_NAME,EMBEDDING_SERVER_SOCKET,EMBEDDING_SERVER_MAX_BATCH,EMBEDDING_SERVER_MAX_WAIT_MS
+from src.embedding_server import EmbeddingServer
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_SOCKET = "/tmp/yugioh-embeddings.sock"
+
+
+def main():
+    """Load the embedding model once and serve it to every app process on this node over a Unix socket"""
+    import argparse
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    parser = argparse.ArgumentParser(description='Shared Yu-Gi-Oh! embedding server')
+    parser.add_argument('--socket', default=EMBEDDING_SERVER_SOCKET or DEFAULT_SOCKET,
+                        help='Unix socket to listen on; point EMBEDDING_SERVER_SOCKET at it in the app processes')
+    parser.add_argument('--model', default=EMBEDDING_MODEL_NAME)
+    parser.add_argument('--max-batch', type=int, default=EMBEDDING_SERVER_MAX_BATCH,
+                        help='Texts per forward pass before a batch is sent without waiting')
+    parser.add_argument('--max-wait-ms', type=float, default=EMBEDDING_SERVER_MAX_WAIT_MS,
+                        help='How long the first request of a batch waits for others to join it')
+    args = parser.parse_args()
+
+    embedding = HuggingFaceEmbeddings(model_name=args.model)
+    server = EmbeddingServer(embedding, args.socket, max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        logger.info(f"Embedding server stopped: {server.batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
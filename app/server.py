@@ -0,0 +1,164 @@
+import asyncio
+import contextlib
+import sys
+import os
+import time
+
+# Set environment variables to avoid warnings
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web
+from config.config import SERVER_HOST,SERVER_PORT,SERVER_MAX_CONCURRENCY,SERVER_MAX_QUEUE,SERVER_QUEUE_TIMEOUT,METRICS_TRACE_PATH
+from utils.logger import get_logger
+from utils import metrics
+
+logger = get_logger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class AdmissionControl:
+    """Serves at most max_concurrency requests at once; up to max_queue more wait for a slot, the rest are turned away"""
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.served = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        if self.semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull(f"{self.waiting} requests already waiting")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QueueFull(f"no slot within {self.queue_timeout:.0f}s")
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self.served += 1
+        self.semaphore.release()
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "served": self.served,
+            "rejected": self.rejected,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+async def recommend(request: web.Request) -> web.Response:
+    try:
+        body = await request.json()
+    except ValueError:
+        return web.json_response({"error": "Request body must be JSON"}, status=400)
+    query = body.get("query") if isinstance(body, dict) else None
+    if not isinstance(query, str) or not query.strip():
+        return web.json_response({"error": "'query' must be a non-empty string"}, status=400)
+
+    admission = request.app["admission"]
+    start = time.perf_counter()
+    try:
+        # The request trace also covers the time spent queued for a slot
+        with metrics.trace("http_recommend", path=METRICS_TRACE_PATH, query=query) as trace:
+            with metrics.stage("queue_wait"):
+                await admission.acquire()
+            try:
+                answer = await request.app["pipeline"].arecommend(query)
+            finally:
+                admission.release()
+    except QueueFull as e:
+        logger.warning(f"Rejected query, server is at capacity: {e}")
+        return web.json_response(
+            {"error": "Server is at capacity, retry later"},
+            status=503,
+            headers={"Retry-After": "1"}
+        )
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+
+    payload = {
+        "query": query,
+        "answer": answer,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+    # Opt-in per-request breakdown, e.g. {"query": "...", "trace": true}
+    if body.get("trace"):
+        payload["trace"] = trace.to_dict()
+    return web.json_response(payload)
+
+
+async def metrics_endpoint(request: web.Request) -> web.Response:
+    return web.Response(body=metrics.render().encode("utf-8"),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok", **request.app["admission"].stats()})
+
+
+def create_app(pipeline, max_concurrency: int = SERVER_MAX_CONCURRENCY, max_queue: int = SERVER_MAX_QUEUE,
+               queue_timeout: float = SERVER_QUEUE_TIMEOUT) -> web.Application:
+    """JSON API over an initialized pipeline: POST /recommend {"query": ...}, GET /health, GET /metrics"""
+    app = web.Application()
+    app["pipeline"] = pipeline
+    app["admission"] = AdmissionControl(max_concurrency, max_queue, queue_timeout)
+    app.router.add_post("/recommend", recommend)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics_endpoint)
+
+    async def close_pipeline(app):
+        app["pipeline"].close()
+
+    app.on_cleanup.append(close_pipeline)
+    return app
+
+
+def main():
+    """Serve the recommendation pipeline over HTTP"""
+    import argparse
+    from pipeline.pipeline import YuGiOhRecommendationPipeline
+
+    parser = argparse.ArgumentParser(description='Yu-Gi-Oh! recommendation HTTP service')
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--max-concurrency', type=int, default=SERVER_MAX_CONCURRENCY,
+                        help='Requests processed at once')
+    parser.add_argument('--max-queue', type=int, default=SERVER_MAX_QUEUE,
+                        help='Requests allowed to wait for a slot before new ones get 503')
+    args = parser.parse_args()
+
+    pipeline = YuGiOhRecommendationPipeline()
+    web.run_app(create_app(pipeline, args.max_concurrency, args.max_queue), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
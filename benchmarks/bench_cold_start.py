@@ -0,0 +1,83 @@
+import sys
+import os
+import json
+import subprocess
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each mode runs in a fresh interpreter so nothing is imported or loaded yet.
+# "ui_ready" is when the app could render its first page.
+EAGER = """
+import json, sys, time
+start = time.perf_counter()
+from pipeline.pipeline import YuGiOhRecommendationPipeline
+imported = time.perf_counter()
+from benchmarks.stub_llm import StubChatModel
+pipeline = YuGiOhRecommendationPipeline(llm=StubChatModel())
+ready = time.perf_counter()
+query_start = time.perf_counter()
+pipeline.recommender.generate(sys.argv[1], pipeline.recommender.retrieve(sys.argv[1]))
+done = time.perf_counter()
+print(json.dumps({"import_seconds": imported - start, "ui_ready_seconds": ready - start,
+                  "pipeline_ready_seconds": ready - start, "first_query_seconds": done - query_start}))
+"""
+
+BACKGROUND = """
+import json, sys, time
+start = time.perf_counter()
+from pipeline.warm_start import BackgroundPipeline
+imported = time.perf_counter()
+loader = BackgroundPipeline(warm_up=True).start()
+pipeline = loader.wait()
+ready = time.perf_counter()
+from benchmarks.stub_llm import StubChatModel
+pipeline.recommender.llm = StubChatModel()
+query_start = time.perf_counter()
+pipeline.recommender.generate(sys.argv[1], pipeline.recommender.retrieve(sys.argv[1]))
+done = time.perf_counter()
+print(json.dumps({"import_seconds": imported - start, "ui_ready_seconds": imported - start,
+                  "pipeline_ready_seconds": ready - start, "first_query_seconds": done - query_start,
+                  "background": loader.timings}))
+"""
+
+
+def run(code: str, query: str) -> dict:
+    result = subprocess.run([sys.executable, "-c", code, query], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "subprocess failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    """Compare eager startup with the background warm start: time to first page and to the first answer"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark app cold start')
+    parser.add_argument('--query', default="Trap cards that destroy opponent's cards", help='First user query')
+    parser.add_argument('--runs', type=int, default=3, help='Fresh processes per mode')
+    parser.add_argument('--output', help='Write the measurements to this JSON file')
+    args = parser.parse_args()
+
+    report = {}
+    for mode, code in (("eager", EAGER), ("background", BACKGROUND)):
+        runs = [run(code, args.query) for _ in range(args.runs)]
+        report[mode] = {
+            key: round(sorted(run_[key] for run_ in runs)[len(runs) // 2], 3)
+            for key in ("import_seconds", "ui_ready_seconds", "pipeline_ready_seconds", "first_query_seconds")
+        }
+        if mode == "background":
+            report[mode]["background"] = runs[-1]["background"]
+
+    print(f"{'mode':<12}{'imports':>10}{'UI ready':>10}{'pipeline':>10}{'1st query':>11}   (median seconds)")
+    for mode, timings in report.items():
+        print(f"{mode:<12}{timings['import_seconds']:>10.2f}{timings['ui_ready_seconds']:>10.2f}"
+              f"{timings['pipeline_ready_seconds']:>10.2f}{timings['first_query_seconds']:>11.3f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from src.data_loader import YuGiOhDataLoader
+
+
+def main():
+    """Compare the row-wise and columnar combined_info builders on a replicated card dump"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark combined_info generation')
+    parser.add_argument('--csv', default='data/yugioh_cards_500.csv', help='Source card CSV')
+    parser.add_argument('--rows', type=int, default=100_000, help='Rows to replicate the source up to')
+    args = parser.parse_args()
+
+    loader = YuGiOhDataLoader(args.csv, "")
+    cards = loader.load_clean_cards()
+
+    repeats = -(-args.rows // len(cards))
+    df = pd.concat([cards] * repeats, ignore_index=True).head(args.rows)
+    print(f"Benchmarking on {len(df)} rows ({len(cards)} unique cards from {args.csv})")
+
+    start = time.perf_counter()
+    row_wise = df.apply(loader.create_combined_info, axis=1)
+    row_wise_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columnar = loader.build_combined_info(df)
+    columnar_seconds = time.perf_counter() - start
+
+    mismatches = int((row_wise != columnar).sum())
+
+    print(f"df.apply(create_combined_info): {row_wise_seconds:.2f}s ({len(df) / row_wise_seconds:,.0f} rows/s)")
+    print(f"build_combined_info:            {columnar_seconds:.2f}s ({len(df) / columnar_seconds:,.0f} rows/s)")
+    print(f"Speedup: {row_wise_seconds / columnar_seconds:.1f}x, mismatching rows: {mismatches}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
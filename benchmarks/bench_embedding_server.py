@@ -0,0 +1,126 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Resident memory of a fresh app-like process once its embeddings can answer a query
+RSS = """
+import json
+from src.vector_store import load_embedding
+load_embedding().embed_query("warm up")
+with open("/proc/self/status") as f:
+    rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+print(json.dumps({"rss_mb": rss / 1024}))
+"""
+
+
+def start_server(embedding, socket_path: str, max_batch: int, max_wait_ms: float):
+    """Run an EmbeddingServer on a daemon thread; returns it once the socket accepts connections"""
+    from src.embedding_server import EmbeddingServer, wait_for_server
+
+    server = EmbeddingServer(embedding, socket_path, max_batch_size=max_batch, max_wait_ms=max_wait_ms)
+    threading.Thread(target=asyncio.run, args=(server.serve(),), name="embedding-server", daemon=True).start()
+    if not wait_for_server(socket_path, timeout=30):
+        raise RuntimeError(f"Embedding server did not start on {socket_path}")
+    return server
+
+
+def throughput(embedding, queries, concurrency: int) -> float:
+    """Queries per second with `concurrency` threads each embedding one query at a time"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(embedding.embed_query, queries))
+    return len(queries) / (time.perf_counter() - start)
+
+
+def process_rss(socket_path: str = None) -> float:
+    env = dict(os.environ, EMBEDDING_SERVER_SOCKET=socket_path or "", EMBEDDING_CACHE_PATH="")
+    result = subprocess.run([sys.executable, "-c", RSS], cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "subprocess failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])["rss_mb"]
+
+
+def main():
+    """Concurrent query embedding: one in-process model per caller vs the shared micro-batching server"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the shared embedding server')
+    parser.add_argument('--embeddings', choices=['model', 'hash'], default='model',
+                        help='model: the local sentence-transformers model (must already be downloaded); '
+                             'hash: deterministic hash embeddings, only checks the plumbing')
+    parser.add_argument('--queries', type=int, default=2000, help='Distinct queries embedded per run')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32], help='Concurrent callers')
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--output', help='Write the measurements to this JSON file')
+    args = parser.parse_args()
+
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+    from benchmarks.load_test import DEFAULT_QUERIES
+    from config.config import EMBEDDING_MODEL_NAME
+    from src.embedding_server import EmbeddingClient
+
+    if args.embeddings == 'hash':
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        embedding = DeterministicFakeEmbedding(size=384)
+    else:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        embedding = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+
+    # Distinct texts, so neither side can profit from repeats
+    queries = [f"{DEFAULT_QUERIES[i % len(DEFAULT_QUERIES)]} #{i}" for i in range(args.queries)]
+
+    with tempfile.TemporaryDirectory(prefix="yugioh-embed-") as work_dir:
+        socket_path = os.path.join(work_dir, "embeddings.sock")
+        server = start_server(embedding, socket_path, args.max_batch, args.max_wait_ms)
+        client = EmbeddingClient(socket_path)
+
+        local, shared = np.asarray(embedding.embed_documents(queries[:32])), np.asarray(client.embed_documents(queries[:32]))
+        report = {"max_abs_diff": float(np.abs(local - shared).max()), "throughput_qps": {}}
+
+        for concurrency in args.concurrency:
+            before = server.batcher.stats()
+            in_process = throughput(embedding, queries, concurrency)
+            via_server = throughput(client, queries, concurrency)
+            after = server.batcher.stats()
+            batches = after["batches"] - before["batches"]
+            report["throughput_qps"][concurrency] = {
+                "in_process": round(in_process, 1),
+                "server": round(via_server, 1),
+                "speedup": round(via_server / in_process, 2),
+                "texts_per_batch": round((after["texts"] - before["texts"]) / batches, 2) if batches else 0.0,
+            }
+
+        if args.embeddings == 'model':
+            report["process_rss_mb"] = {"in_process_model": round(process_rss(), 1),
+                                        "server_client": round(process_rss(socket_path), 1)}
+
+    print(f"Server vs in-process vectors: max abs diff {report['max_abs_diff']:.2e}")
+    print(f"{'callers':>8}{'in-process q/s':>16}{'server q/s':>12}{'speedup':>9}{'texts/batch':>13}")
+    for concurrency, row in report["throughput_qps"].items():
+        print(f"{concurrency:>8}{row['in_process']:>16.1f}{row['server']:>12.1f}{row['speedup']:>8.2f}x"
+              f"{row['texts_per_batch']:>13.1f}")
+    if "process_rss_mb" in report:
+        rss = report["process_rss_mb"]
+        print(f"App process RSS: {rss['in_process_model']:.0f} MB with its own model, "
+              f"{rss['server_client']:.0f} MB as a server client")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
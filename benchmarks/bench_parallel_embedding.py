@@ -0,0 +1,68 @@
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from src.data_loader import YuGiOhDataLoader
+from src.parallel_embedding import ParallelEmbeddings
+from config.config import EMBEDDING_MODEL_NAME, EMBED_BATCH_SIZE
+
+
+def main():
+    """Report cards/sec for the index build embedding step from 1 to N worker processes against the in-process model"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark parallel card embedding')
+    parser.add_argument('--csv', default='data/yugioh_cards_500.csv', help='Source card CSV')
+    parser.add_argument('--cards', type=int, default=4000, help='Cards to embed (source is replicated as needed)')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1, help='Largest worker count to try')
+    parser.add_argument('--batch-size', type=int, default=EMBED_BATCH_SIZE, help='Texts per worker task')
+    args = parser.parse_args()
+
+    loader = YuGiOhDataLoader(args.csv, "")
+    cards = loader.load_clean_cards()
+    repeats = -(-args.cards // len(cards))
+    df = pd.concat([cards] * repeats, ignore_index=True).head(args.cards)
+    texts = [f"combined_info: {text}" for text in loader.build_combined_info(df)]
+
+    worker_counts = []
+    workers = 1
+    while workers < args.max_workers:
+        worker_counts.append(workers)
+        workers *= 2
+    worker_counts.append(args.max_workers)
+
+    # Reference: the in-process model a build uses without --workers
+    from langchain_huggingface import HuggingFaceEmbeddings
+    local = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    local.embed_documents(texts[:args.batch_size])
+    start = time.perf_counter()
+    reference = np.array(local.embed_documents(texts))
+    baseline = len(texts) / (time.perf_counter() - start)
+    print(f" in-process: {baseline:8,.0f} cards/s")
+
+    for workers in worker_counts:
+        embedding = ParallelEmbeddings(EMBEDDING_MODEL_NAME, workers=workers, batch_size=args.batch_size)
+        try:
+            # Warm-up: every worker loads its model before the timed run
+            embedding.embed_documents(texts[:args.batch_size] * workers)
+
+            start = time.perf_counter()
+            vectors = np.array(embedding.embed_documents(texts))
+            seconds = time.perf_counter() - start
+        finally:
+            embedding.close()
+
+        rate = len(texts) / seconds
+        # Not bit-identical (batch padding and thread count differ), so report how far off the pool is
+        max_diff = float(np.abs(vectors - reference).max())
+        cosine = np.sum(vectors * reference, axis=1) / (
+            np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1))
+        print(f"{workers:>3} workers: {rate:8,.0f} cards/s  ({rate / baseline:.2f}x)  "
+              f"vs in-process: max abs diff {max_diff:.1e}, min cosine {float(cosine.min()):.6f}")
+
+
+if __name__ == "__main__":
+    main()
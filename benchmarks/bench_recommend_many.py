@@ -0,0 +1,56 @@
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import DEFAULT_QUERIES
+
+
+def main():
+    """Compare a sequential recommend() loop with recommend_many() on the same queries, using a stub LLM"""
+    import argparse
+    from pipeline.pipeline import YuGiOhRecommendationPipeline
+    from benchmarks.stub_llm import StubChatModel
+
+    parser = argparse.ArgumentParser(description='Benchmark batch recommendations')
+    parser.add_argument('--queries', help='File with one query per line (default: a built-in mix)')
+    parser.add_argument('--count', type=int, default=1000, help='Queries in the batch (the file is repeated as needed)')
+    parser.add_argument('--sequential', type=int, default=50, help='Queries timed for the sequential loop')
+    parser.add_argument('--llm-latency', type=float, default=0.3, help='Seconds the stub LLM waits per call')
+    parser.add_argument('--llm-workers', type=int, default=8, help='Concurrent LLM calls for recommend_many')
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+    batch = [queries[i % len(queries)] for i in range(args.count)]
+
+    pipeline = YuGiOhRecommendationPipeline(llm=StubChatModel(latency=args.llm_latency))
+    # Without the answer cache both paths pay for every distinct query
+    pipeline.recommender.answer_cache = None
+
+    sample = batch[:args.sequential]
+    start = time.perf_counter()
+    sequential = [pipeline.recommend(query) for query in sample]
+    per_query = (time.perf_counter() - start) / len(sample)
+    print(f"sequential recommend():  {per_query * 1000:.0f} ms/query, "
+          f"{len(batch)} queries would take ~{per_query * len(batch):.1f}s")
+
+    start = time.perf_counter()
+    results = pipeline.recommend_many(batch, llm_workers=args.llm_workers)
+    seconds = time.perf_counter() - start
+    errors = sum(result["error"] is not None for result in results)
+    print(f"recommend_many():        {seconds:.1f}s for {len(batch)} queries "
+          f"({len(set(batch))} distinct), {errors} errors")
+    print(f"Speedup: {per_query * len(batch) / seconds:.1f}x")
+
+    # The stub answer is a digest of the prompt, so equal answers mean equal retrieved context
+    mismatches = sum(result["answer"] != answer for result, answer in zip(results, sequential))
+    print(f"Answers differing from the sequential loop: {mismatches} of {len(sample)}")
+    if mismatches or errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import sys
+import os
+import json
+import time
+import tempfile
+import subprocess
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RECALL_KS = (1, 5, 10)
+
+
+def percentiles(seconds) -> dict:
+    if not seconds:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    ms = np.asarray(seconds) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2),
+            "mean": round(float(ms.mean()), 2)}
+
+
+def recall_at(retrieved, expected, k: int) -> float:
+    """Share of the expected cards found in the top k, out of as many as can fit in k"""
+    found = set(retrieved[:k]) & set(expected)
+    return len(found) / min(k, len(expected))
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=BENCHMARK_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_indexes(csv_path: str, work_dir: str, embedding) -> tuple:
+    """Run the build pipeline steps into work_dir; returns (artifact paths, step timings)"""
+    from src.data_loader import YuGiOhDataLoader
+    from src.vector_store import VectorStoreBuilder
+    from src.card_table import CardTable
+    from src.name_index import CardNameIndex
+    from src.card_graph import CardGraph
+    from src.lexical_index import BM25Index
+
+    paths = {
+        "processed": os.path.join(work_dir, "cards_processed.store"),
+        "card_table": os.path.join(work_dir, "card_table.store"),
+        "name_index": os.path.join(work_dir, "card_names.json"),
+        "card_graph": os.path.join(work_dir, "card_graph.json"),
+        "lexical_index": os.path.join(work_dir, "card_bm25.json"),
+        "chroma": os.path.join(work_dir, "chroma_db"),
+    }
+    timings = {}
+
+    start = time.perf_counter()
+    loader = YuGiOhDataLoader(csv_path, paths["processed"])
+    cards = loader.load_clean_cards()
+    loader.load_and_process(cards)
+    timings["process_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loader.build_card_table(paths["card_table"], cards)
+    card_table = CardTable.load(paths["card_table"])
+    CardNameIndex.from_card_table(card_table).save(paths["name_index"])
+    CardGraph.from_card_table(card_table).save(paths["card_graph"])
+    BM25Index.from_card_table(card_table).save(paths["lexical_index"])
+    timings["tables_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    builder = VectorStoreBuilder(paths["processed"], persist_dir=paths["chroma"], embedding=embedding,
+                                 embedding_cache_path=None)
+    builder.build_and_save_vectorstore(incremental=False)
+    timings["index_seconds"] = time.perf_counter() - start
+
+    timings["cards"] = len(card_table)
+    return paths, {key: round(value, 3) if isinstance(value, float) else value for key, value in timings.items()}
+
+
+def run_query(pipeline, query: str):
+    """Retrieve and answer one query inside a trace; returns (trace, retrieved card names)"""
+    from utils import metrics
+
+    recommender = pipeline.recommender
+    with metrics.trace("benchmark_query", query=query) as trace:
+        docs = recommender.retrieve(query)
+        recommender.generate(query, docs)
+    names = list(dict.fromkeys(doc.metadata.get("name") for doc in docs if doc.metadata.get("name")))
+    return trace, names
+
+
+def main():
+    """Offline retrieval and end-to-end benchmark over the 500 card sample with a stub LLM"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Offline retrieval and end-to-end benchmark')
+    parser.add_argument('--csv', default='data/yugioh_cards_500.csv', help='Card CSV to build the indexes from')
+    parser.add_argument('--golden', default=os.path.join(BENCHMARK_DIR, 'golden_queries.json'), help='Golden query set')
+    parser.add_argument('--embeddings', choices=['model', 'hash'], default='model',
+                        help='model: the local sentence-transformers model (must already be downloaded); '
+                             'hash: deterministic hash embeddings, no model needed (semantic recall is meaningless)')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over the golden set (embedding cache cleared per pass)')
+    parser.add_argument('--k', type=int, help='Override the retriever k')
+    parser.add_argument('--score-threshold', type=float, help='Override the retriever score threshold')
+    parser.add_argument('--output', default=os.path.join(BENCHMARK_DIR, 'results', 'retrieval_latest.json'),
+                        help='Full JSON report')
+    parser.add_argument('--history', default=os.path.join(BENCHMARK_DIR, 'results', 'history.jsonl'),
+                        help='Summary line appended per run (empty to skip)')
+    parser.add_argument('--min-recall', type=float, help='Exit with status 1 if recall@5 falls below this')
+    args = parser.parse_args()
+
+    # Offline: never reach for the hub, and keep the on-disk query cache out of the timings
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ["EMBEDDING_CACHE_PATH"] = ""
+
+    from benchmarks.stub_llm import StubChatModel
+    from config.config import EMBEDDING_MODEL_NAME
+    from pipeline.pipeline import YuGiOhRecommendationPipeline
+
+    if args.embeddings == 'hash':
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        embedding = DeterministicFakeEmbedding(size=384)
+    else:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        embedding = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+
+    with open(args.golden, encoding='utf-8') as f:
+        golden = json.load(f)
+
+    with tempfile.TemporaryDirectory(prefix="yugioh-bench-") as work_dir:
+        paths, build = build_indexes(args.csv, work_dir, embedding)
+        print(f"Built indexes for {build['cards']} cards: process {build['process_seconds']}s, "
+              f"tables {build['tables_seconds']}s, vector index {build['index_seconds']}s")
+
+        pipeline = YuGiOhRecommendationPipeline(
+            persist_dir=paths["chroma"],
+            card_table_path=paths["card_table"],
+            name_index_path=paths["name_index"],
+            card_graph_path=paths["card_graph"],
+            lexical_index_path=paths["lexical_index"],
+            llm=StubChatModel(),
+            embedding=embedding
+        )
+        recommender = pipeline.recommender
+        # Every query should pay for retrieval and generation, not hit an answer from an earlier pass
+        recommender.answer_cache = None
+        if args.k is not None:
+            recommender.retriever.k = args.k
+        if args.score_threshold is not None:
+            recommender.retriever.score_threshold = args.score_threshold
+
+        results = []
+        for repeat in range(args.repeat):
+            pipeline.query_embedding.clear()
+            for index, item in enumerate(golden):
+                trace, names = run_query(pipeline, item["query"])
+                if repeat:
+                    results[index]["runs"].append(trace)
+                    continue
+                results.append({"item": item, "names": names, "runs": [trace]})
+
+        pipeline.close()
+
+    per_query = []
+    for result in results:
+        item, names, runs = result["item"], result["names"], result["runs"]
+        spans = runs[0].spans
+        per_query.append({
+            "category": item["category"],
+            "query": item["query"],
+            "route": runs[0].attrs.get("route"),
+            "fallback_reason": runs[0].attrs.get("fallback_reason"),
+            "retrieval_calls": {
+                "vector_search": sum(span["stage"] == "vector_search" for span in spans),
+                "embed": sum(span["stage"] == "embed_query" for span in spans),
+                "bm25": sum(span["stage"] == "bm25_search" for span in spans),
+            },
+            "context_tokens": runs[0].attrs.get("context_tokens"),
+            "retrieval_ms": [next(span["ms"] for span in run.spans if span["stage"] == "retrieve") for run in runs],
+            "end_to_end_ms": [run.duration_ms for run in runs],
+            **{f"recall@{k}": round(recall_at(names, item["expected"], k), 3) for k in RECALL_KS},
+            "retrieved": names[:10],
+            "expected": item["expected"],
+        })
+
+    def summarize(rows) -> dict:
+        return {
+            "queries": len(rows),
+            "retrieval_latency_ms": percentiles([ms / 1000 for row in rows for ms in row["retrieval_ms"]]),
+            "end_to_end_latency_ms": percentiles([ms / 1000 for row in rows for ms in row["end_to_end_ms"]]),
+            "retrieval_calls_per_query": {
+                call: round(float(np.mean([row["retrieval_calls"][call] for row in rows])), 2)
+                for call in ("vector_search", "embed", "bm25")
+            },
+            "fallback_rate": round(sum(row["route"] == "fallback" for row in rows) / len(rows), 3),
+            **{f"recall@{k}": round(float(np.mean([row[f"recall@{k}"] for row in rows])), 3) for k in RECALL_KS},
+        }
+
+    categories = sorted({row["category"] for row in per_query})
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "config": {
+            "csv": args.csv,
+            "embeddings": args.embeddings,
+            "repeat": args.repeat,
+            "k": recommender.retriever.k,
+            "score_threshold": recommender.retriever.score_threshold,
+        },
+        "build": build,
+        "overall": summarize(per_query),
+        "by_category": {category: summarize([row for row in per_query if row["category"] == category])
+                        for category in categories},
+        "queries": per_query,
+    }
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    if args.history:
+        summary = {key: report[key] for key in ("timestamp", "commit", "config", "build", "overall")}
+        with open(args.history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(summary) + "\n")
+
+    print(f"{'category':<18}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'searches':>10}{'R@1':>7}{'R@5':>7}{'R@10':>7}")
+    for name, summary in [*report["by_category"].items(), ("overall", report["overall"])]:
+        latency = summary["end_to_end_latency_ms"]
+        print(f"{name:<18}{latency['p50']:>9.1f}{latency['p95']:>9.1f}{latency['p99']:>9.1f}"
+              f"{summary['retrieval_calls_per_query']['vector_search']:>10.1f}"
+              f"{summary['recall@1']:>7.2f}{summary['recall@5']:>7.2f}{summary['recall@10']:>7.2f}")
+    print(f"Report written to {args.output}")
+
+    if args.min_recall is not None and report["overall"]["recall@5"] < args.min_recall:
+        print(f"recall@5 {report['overall']['recall@5']} is below {args.min_recall}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
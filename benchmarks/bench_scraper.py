@@ -0,0 +1,193 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import tempfile
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+PRICE_FIELDS = ['cardmarket_price', 'tcgplayer_price', 'amazon_price', 'coolstuffinc_price']
+IMAGE_FIELDS = ['image_url', 'image_url_small']
+
+
+def fixture_cards(csv_path: str):
+    """The sample cards in the nested shape the card search API returns"""
+    cards = []
+    for record in pd.read_csv(csv_path).to_dict('records'):
+        record = {key: value for key, value in record.items() if not pd.isna(value)}
+        card = {key: value for key, value in record.items() if key not in PRICE_FIELDS + IMAGE_FIELDS}
+        card['card_prices'] = [{field: str(record.get(field, '')) for field in PRICE_FIELDS}]
+        card['card_images'] = [{field: record.get(field, '') for field in IMAGE_FIELDS}]
+        cards.append(card)
+    return cards
+
+
+class FixtureServer:
+    """Local stand-in for the card search endpoint: paginated fixture JSON plus injectable faults.
+
+    faults maps an offset to a list of faults served once each before the page itself;
+    offsets in persistent answer every request with a server error.
+    """
+
+    def __init__(self, cards):
+        self.cards = cards
+        self.faults = {}
+        self.persistent = set()
+        self.requests = {}
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = parse_qs(urlparse(self.path).query)
+                offset = int(params.get('offset', ['0'])[0])
+                num = int(params.get('num', ['100'])[0])
+                with server._lock:
+                    server.requests[offset] = server.requests.get(offset, 0) + 1
+                    queued = server.faults.get(offset)
+                    fault = queued.pop(0) if queued else None
+                    if fault is None and offset in server.persistent:
+                        fault = 'server_error'
+                server.respond(self, fault, server.cards[offset:offset + num])
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/api/elastic/card_search.php"
+        threading.Thread(target=self.httpd.serve_forever, name="fixture-server", daemon=True).start()
+
+    def respond(self, handler, fault, page):
+        status, headers, body = 200, {'Content-Type': 'application/json'}, json.dumps({'data': page})
+        if fault == 'retry_after_date':
+            status, body = 429, '{"error": "rate limited"}'
+            headers['Retry-After'] = formatdate(time.time() + 1, usegmt=True)
+        elif fault == 'retry_after_garbage':
+            status, body = 429, '{"error": "rate limited"}'
+            headers['Retry-After'] = 'soon'
+        elif fault == 'html':
+            headers['Content-Type'] = 'text/html'
+            body = '<html><body>Temporarily unavailable</body></html>'
+        elif fault == 'not_a_page':
+            body = json.dumps(page)
+        elif fault == 'server_error':
+            status, body = 500, '{"error": "internal"}'
+
+        data = body.encode('utf-8')
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def reset(self):
+        with self._lock:
+            self.faults = {}
+            self.persistent = set()
+            self.requests = {}
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    """Crawl a local fixture server with the async scraper: clean run, transient faults, a persistent failure, resume"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark and check the async scraper against a local fixture server')
+    parser.add_argument('--csv', default='data/yugioh_cards_500.csv', help='Cards served by the fixture server')
+    parser.add_argument('--page-size', type=int, default=25)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=50.0, help='Requests per second allowed by the token bucket')
+    args = parser.parse_args()
+
+    # The scraper logs to logs/scraper.log relative to the working directory
+    os.makedirs('logs', exist_ok=True)
+    import logging
+    from data.scraper import AsyncYGOScraper, read_card_records
+    logging.getLogger().setLevel(logging.WARNING)
+
+    cards = fixture_cards(args.csv)
+    expected_ids = [str(card['id']) for card in cards]
+    server = FixtureServer(cards)
+    offsets = list(range(0, len(cards), args.page_size))
+    middle = offsets[len(offsets) // 2]
+    failures = []
+
+    def check(name, ok, detail=""):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f' ({detail})' if detail else ''}")
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory(prefix="yugioh-scrape-") as work_dir:
+        def scraper():
+            return AsyncYGOScraper(server.url, concurrency=args.concurrency, rate=args.rate, page_size=args.page_size,
+                                   checkpoint_path=os.path.join(work_dir, 'checkpoint.json'),
+                                   pages_path=os.path.join(work_dir, 'pages.jsonl'))
+
+        def crawl_to_file(name):
+            filename = os.path.join(work_dir, f"{name}.jsonl")
+            start = time.perf_counter()
+            scraper().run(num_pages=None, filename=filename, output_format='jsonl')
+            seconds = time.perf_counter() - start
+            ids = [record['id'] for record in read_card_records(filename, 'jsonl')] if os.path.exists(filename) else []
+            return ids, seconds
+
+        try:
+            # Clean crawl
+            ids, seconds = crawl_to_file("clean")
+            check("clean crawl returns every fixture card in order", ids == expected_ids,
+                  f"{len(ids)} cards, {len(offsets)} pages in {seconds:.2f}s, {len(offsets) / seconds:.1f} pages/s")
+
+            # Every transient fault once, on different pages
+            server.reset()
+            kinds = ['retry_after_date', 'retry_after_garbage', 'html', 'not_a_page', 'server_error']
+            for offset, kind in zip(offsets, kinds):
+                server.faults[offset] = [kind]
+            ids, seconds = crawl_to_file("transient")
+            retried = sum(server.requests.get(offset, 0) - 1 for offset in offsets)
+            check("transient faults (HTTP-date and bad Retry-After, HTML, non-page JSON, 500) are retried",
+                  ids == expected_ids, f"{retried} retries, {seconds:.2f}s")
+
+            # A page that never succeeds ends the crawl with an error and leaves the finished pages checkpointed
+            server.reset()
+            server.persistent.add(middle)
+            crawler = scraper()
+            try:
+                asyncio.run(crawler.crawl())
+                raised = None
+            except RuntimeError as e:
+                raised = e
+            checkpoint = crawler.load_checkpoint()
+            check("persistent failure raises after the retries", raised is not None and server.requests.get(middle) == 3,
+                  f"{server.requests.get(middle, 0)} attempts at offset {middle}")
+            check("persistent failure is not mistaken for the end of the data",
+                  middle not in checkpoint['completed_offsets'] and checkpoint['end_offset'] in (None, len(cards)),
+                  f"{len(checkpoint['completed_offsets'])} pages checkpointed")
+
+            # Resume once the page recovers: only the missing pages are requested again
+            done_before = set(checkpoint['completed_offsets'])
+            server.reset()
+            ids, seconds = crawl_to_file("resumed")
+            refetched = sorted(offset for offset in server.requests if offset in done_before)
+            check("resumed crawl completes with every card", ids == expected_ids, f"{len(ids)} cards in {seconds:.2f}s")
+            check("resumed crawl skips checkpointed pages", not refetched,
+                  f"{len(server.requests)} requests after {len(done_before)} checkpointed pages")
+        finally:
+            server.close()
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import sys
+import os
+import time
+import asyncio
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import aiohttp
+from aiohttp import web
+
+DEFAULT_QUERIES = [
+    "Tell me about Blue-Eyes White Dragon",
+    "What is the fusion material of Dark Paladin?",
+    "Show me DARK Spellcaster monsters with ATK over 2000",
+    "Cards related to Dark Magician",
+    "What are good Trap cards that negate attacks?",
+    "Which dragons can be special summoned from the graveyard?",
+    "Find a Warrior monster that destroys spell cards",
+    "What Level 4 monsters have ATK 1800?",
+]
+
+
+def summarize(label: str, latencies, seconds: float, errors: int = 0):
+    latencies = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0, 0, 0)
+    print(f"{label:<28} {len(latencies) / seconds:8.1f} req/s   p50 {p50:7.0f} ms   p95 {p95:7.0f} ms   "
+          f"p99 {p99:7.0f} ms   errors {errors}")
+    return len(latencies) / seconds
+
+
+def run_sequential(pipeline, queries):
+    """The Streamlit path: one blocking recommend() after another"""
+    latencies = []
+    start = time.perf_counter()
+    for query in queries:
+        began = time.perf_counter()
+        pipeline.recommend(query)
+        latencies.append(time.perf_counter() - began)
+    return latencies, time.perf_counter() - start
+
+
+async def run_http(url: str, queries, clients: int):
+    """Send the queries to POST {url}/recommend from `clients` concurrent connections"""
+    pending = iter(queries)
+    latencies = []
+    errors = 0
+
+    async def client(session):
+        nonlocal errors
+        for query in pending:
+            began = time.perf_counter()
+            async with session.post(f"{url}/recommend", json={"query": query}) as response:
+                await response.read()
+                if response.status == 200:
+                    latencies.append(time.perf_counter() - began)
+                else:
+                    errors += 1
+
+    start = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=clients)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=None)) as session:
+        await asyncio.gather(*(client(session) for _ in range(clients)))
+    return latencies, time.perf_counter() - start, errors
+
+
+async def serve_and_load(pipeline, queries, clients: int, max_concurrency: int, max_queue: int):
+    from app.server import create_app
+
+    runner = web.AppRunner(create_app(pipeline, max_concurrency, max_queue))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        return await run_http(f"http://127.0.0.1:{port}", queries, clients)
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    """Compare sequential recommend() with the async HTTP service under concurrent load"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Load test the recommendation service')
+    parser.add_argument('--url', help='Load test a running server instead of an in-process one with a stub LLM')
+    parser.add_argument('--queries', help='File with one query per line (default: a built-in mix)')
+    parser.add_argument('--requests', type=int, default=200, help='Total requests to send')
+    parser.add_argument('--clients', type=int, default=32, help='Concurrent HTTP clients')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='Seconds the stub LLM waits per call')
+    parser.add_argument('--max-concurrency', type=int, default=32, help='Server concurrency limit (in-process only)')
+    parser.add_argument('--max-queue', type=int, default=256, help='Server queue size (in-process only)')
+    parser.add_argument('--sequential-requests', type=int, default=20,
+                        help='Requests for the sequential baseline (in-process only, 0 skips it)')
+    parser.add_argument('--keep-answer-cache', action='store_true',
+                        help='Leave the answer cache on (repeated queries then skip the LLM)')
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+    workload = [queries[i % len(queries)] for i in range(args.requests)]
+
+    if args.url:
+        latencies, seconds, errors = asyncio.run(run_http(args.url.rstrip('/'), workload, args.clients))
+        summarize(f"HTTP x{args.clients} clients", latencies, seconds, errors)
+        return
+
+    from pipeline.pipeline import YuGiOhRecommendationPipeline
+    from benchmarks.stub_llm import StubChatModel
+
+    pipeline = YuGiOhRecommendationPipeline(llm=StubChatModel(latency=args.llm_latency))
+    if not args.keep_answer_cache:
+        pipeline.recommender.answer_cache = None
+    print(f"Stub LLM latency {args.llm_latency * 1000:.0f} ms, {len(queries)} distinct queries")
+
+    baseline = None
+    if args.sequential_requests:
+        latencies, seconds = run_sequential(pipeline, workload[:args.sequential_requests])
+        baseline = summarize("sequential recommend()", latencies, seconds)
+
+    latencies, seconds, errors = asyncio.run(
+        serve_and_load(pipeline, workload, args.clients, args.max_concurrency, args.max_queue)
+    )
+    throughput = summarize(f"HTTP x{args.clients} clients", latencies, seconds, errors)
+    if baseline:
+        print(f"Throughput gain: {throughput / baseline:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import asyncio
+import hashlib
+import time
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class StubChatModel(BaseChatModel):
+    """Deterministic offline stand-in for ChatGroq: a fixed delay, then an answer derived from the prompt"""
+
+    latency: float = 0.0
+    calls: int = 0
+    prompt_chars: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _answer(self, messages) -> str:
+        prompt = messages[-1].content
+        self.calls += 1
+        self.prompt_chars += sum(len(message.content) for message in messages)
+        digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:12]
+        return f"Stub answer {digest} for a {len(prompt)} character prompt."
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for index, word in enumerate(self._answer(messages).split(' ')):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if index == 0 else f" {word}"))
@@ -4,4 +4,61 @@ from dotenv import load_dotenv
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-MODEL_NAME = "llama-3.1-8b-instant"
\ No newline at end of file
+MODEL_NAME = "llama-3.1-8b-instant"
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Canonical card stores (memory-mapped columns): scraped cards and the processed index input
+CARD_STORE_PATH = "data/cards.store"
+PROCESSED_STORE_PATH = "data/cards_processed.store"
+
+CARD_TABLE_PATH = "data/card_table.store"
+NAME_INDEX_PATH = "data/card_names.json"
+CARD_GRAPH_PATH = "data/card_graph.json"
+LEXICAL_INDEX_PATH = "data/card_bm25.json"
+
+# Query embedding cache: in-memory LRU size and optional on-disk tier (off unless a path is set,
+# e.g. the file filled by `build_pipeline.py --embedding-cache cache/embeddings.sqlite`)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "") or None
+
+# LLM answer cache: entry limit, time to live and query similarity needed for a near-duplicate hit
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+# Extra vectors per card besides its single full-card entry: any of name, desc, materials (comma separated)
+INDEX_FIELDS = [field.strip() for field in os.getenv("INDEX_FIELDS", "").split(",") if field.strip()]
+
+# Estimated token budget for the card context sent to the LLM
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+# HTTP service: threads for blocking retrieval, requests served at once, and requests allowed to wait for a slot
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "8"))
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
+SERVER_MAX_CONCURRENCY = int(os.getenv("SERVER_MAX_CONCURRENCY", "32"))
+SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "128"))
+SERVER_QUEUE_TIMEOUT = float(os.getenv("SERVER_QUEUE_TIMEOUT", "30"))
+
+# Batch recommendations: concurrent LLM calls (keep under the provider's rate limit)
+BATCH_LLM_WORKERS = int(os.getenv("BATCH_LLM_WORKERS", "8"))
+
+# Metrics: per-request JSON traces are appended here (empty disables), batch jobs write Prometheus text here
+METRICS_TRACE_PATH = os.getenv("METRICS_TRACE_PATH", "") or None
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH", "") or None
+
+# Streamlit app: load the model and indexes on a background thread and render the UI immediately
+BACKGROUND_STARTUP = os.getenv("BACKGROUND_STARTUP", "true").lower() not in ("0", "false", "no")
+
+# Shared embedding server: Unix socket it listens on (empty keeps the model in-process), texts per forward pass,
+# how long to collect concurrent requests, and how long clients wait for the server before loading the model themselves
+EMBEDDING_SERVER_SOCKET = os.getenv("EMBEDDING_SERVER_SOCKET", "") or None
+EMBEDDING_SERVER_MAX_BATCH = int(os.getenv("EMBEDDING_SERVER_MAX_BATCH", "64"))
+EMBEDDING_SERVER_MAX_WAIT_MS = float(os.getenv("EMBEDDING_SERVER_MAX_WAIT_MS", "5"))
+EMBEDDING_SERVER_CONNECT_TIMEOUT = float(os.getenv("EMBEDDING_SERVER_CONNECT_TIMEOUT", "30"))
+
+# Cards per batch for the streaming index build (also the embedding/upsert batch size)
+BUILD_BATCH_SIZE = int(os.getenv("BUILD_BATCH_SIZE", "512"))
+
+# Texts per worker task when embedding with a process pool during builds
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
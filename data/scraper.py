@@ -1,10 +1,22 @@
 import requests
 import csv
 import time
+import hashlib
+import shutil
 import logging
 import re
+import os
+import json
+import sys
+import email.utils
+from datetime import datetime, timezone
 from typing import List, Dict, Any
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.card_store import CardStore, CardStoreWriter, RAW_CARD_SCHEMA
+from utils import metrics
+from config.config import METRICS_EXPORT_PATH
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -15,9 +27,122 @@ logging.basicConfig(
     ]
 )
 
+DEFAULT_BASE_URL = "https://ygoprodeck.com/api/elastic/card_search.php"
+
+CSV_HEADERS = [
+    'id', 'name', 'type', 'desc', 'atk', 'def', 'level', 'rank', 'linkval',
+    'race', 'attribute', 'archetype',
+    'cardmarket_price', 'tcgplayer_price', 'amazon_price', 'coolstuffinc_price',
+    'image_url', 'image_url_small'
+]
+
+
+class CardWriter:
+    """Flattens, validates and appends cards page by page to a card store, CSV or JSON Lines file.
+
+    Rows go to `<filename>.part` and are flushed after every page, so downstream stages can read
+    the pages written so far while the crawl is running: tail the CSV/JSONL file, or open the
+    store directory with CardStore, whose row count is refreshed with every flush.
+    commit() renames it into place atomically.
+    """
+
+    def __init__(self, scraper, filename: str, output_format: str = 'store'):
+        if output_format not in ('store', 'csv', 'jsonl'):
+            raise ValueError(f"Unknown output format: {output_format}")
+        self.scraper = scraper
+        self.filename = filename
+        self.output_format = output_format
+        self.written = 0
+        self.invalid = 0
+
+        if output_format == 'store':
+            # Typed columns, the stats are parsed once here instead of in every later stage
+            self.store = CardStoreWriter(filename, RAW_CARD_SCHEMA)
+            self.part_path = self.store.part_path
+            self._pending = []
+            return
+
+        self.part_path = f"{filename}.part"
+        self.file = open(self.part_path, 'w', newline='', encoding='utf-8')
+        if output_format == 'csv':
+            # QUOTE_ALL to ensure proper quoting
+            self.writer = csv.writer(self.file, quoting=csv.QUOTE_ALL)
+            self.writer.writerow(CSV_HEADERS)
+
+    def write_page(self, cards: List[Dict[str, Any]]):
+        for card in cards:
+            self.write_record(self.scraper.flatten_card_data(card))
+        self.flush()
+
+    def flush(self):
+        if self.output_format == 'store':
+            self.store.append_records(self._pending)
+            self._pending = []
+            self.store.flush()
+        else:
+            self.file.flush()
+
+    def write_record(self, card: Dict[str, Any]) -> bool:
+        """Write one already flattened card; False if it failed validation"""
+        if not self.scraper.validate_card_record(card, len(CSV_HEADERS)):
+            self.invalid += 1
+            logging.warning(f"Skipping invalid card record: {card.get('name', 'Unknown')}")
+            return False
+
+        # Ensure the order matches headers
+        if self.output_format == 'store':
+            self._pending.append(card)
+        elif self.output_format == 'csv':
+            self.writer.writerow([card.get(field, '') for field in CSV_HEADERS])
+        else:
+            self.file.write(json.dumps({field: card.get(field, '') for field in CSV_HEADERS}) + '\n')
+        self.written += 1
+        return True
+
+    def commit(self, allow_empty: bool = False) -> bool:
+        """Move the finished file into place; unless allow_empty, nothing is replaced if no valid card was written"""
+        if self.invalid > 0:
+            logging.warning(f"Skipped {self.invalid} invalid card records due to field count mismatch")
+        if not self.written and not allow_empty:
+            logging.error("No valid cards to save after validation")
+            self.abort()
+            return False
+
+        if self.output_format == 'store':
+            self.flush()
+            self.store.close()
+        else:
+            self.file.close()
+            os.replace(self.part_path, self.filename)
+        logging.info(f"Successfully saved {self.written} cards to {self.filename} (skipped {self.invalid} invalid)")
+        return True
+
+    def abort(self):
+        if self.output_format == 'store':
+            self.store.abort()
+            return
+        self.file.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+
+def read_card_records(filename: str, output_format: str = 'store'):
+    """Stream flattened card records back from a file written by CardWriter"""
+    if output_format == 'store':
+        yield from CardStore(filename).iter_records()
+        return
+    with open(filename, 'r', newline='', encoding='utf-8') as f:
+        if output_format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
 class YGOScraper:
-    def __init__(self):
-        self.base_url = "https://ygoprodeck.com/api/elastic/card_search.php"
+    def __init__(self, base_url: str = DEFAULT_BASE_URL):
+        self.base_url = base_url
         self.session = requests.Session()
         self.headers = {
             'accept': 'application/json, text/javascript, */*; q=0.01',
@@ -59,15 +184,16 @@ class YGOScraper:
                     logging.error(f"All attempts failed for params {params}")
                     raise
 
-    def scrape_page(self, offset: int) -> List[Dict[str, Any]]:
-        """Scrape a single page of cards"""
+    def scrape_page(self, offset: int, raise_errors: bool = False) -> List[Dict[str, Any]]:
+        """Scrape a single page of cards; failures return [] unless raise_errors"""
         params = {
             'num': 100,
             'offset': offset
         }
 
         try:
-            data = self.make_request(params)
+            with metrics.stage("scrape_page"):
+                data = self.make_request(params)
 
             # Extract cards from response
             if 'data' in data:
@@ -79,10 +205,15 @@ class YGOScraper:
                 cards = []
 
             logging.info(f"Found {len(cards)} cards on page with offset {offset}")
+            metrics.ITEMS.inc(kind="pages_scraped")
+            metrics.ITEMS.inc(len(cards), kind="cards_scraped")
             return cards
 
         except Exception as e:
             logging.error(f"Error scraping page with offset {offset}: {e}")
+            metrics.ITEMS.inc(kind="pages_failed")
+            if raise_errors:
+                raise
             return []
 
     def clean_text_field(self, text: str) -> str:
@@ -154,22 +285,23 @@ class YGOScraper:
 
         return flattened
 
-    def scrape_all_cards(self) -> List[Dict[str, Any]]:
-        """Scrape ALL Yu-Gi-Oh! cards by continuing until API returns empty"""
-        all_cards = []
+    def iter_pages(self, num_pages: int = None, raise_errors: bool = False):
+        """Yield one page of raw cards at a time; num_pages=None continues until the API returns empty"""
         offset = 0
         batch_size = 100
         page_number = 1
+        total = 0
 
-        while True:
+        while num_pages is None or page_number <= num_pages:
             logging.info(f"Scraping page {page_number} (offset: {offset})")
 
-            cards = self.scrape_page(offset)
+            cards = self.scrape_page(offset, raise_errors)
             if not cards:
                 logging.info(f"No more cards found at offset {offset}. Scraping complete.")
                 break
 
-            all_cards.extend(cards)
+            total += len(cards)
+            yield cards
             offset += batch_size
             page_number += 1
 
@@ -178,31 +310,17 @@ class YGOScraper:
 
             # Progress update every 10 pages
             if page_number % 10 == 0:
-                logging.info(f"Collected {len(all_cards)} cards so far...")
+                logging.info(f"Collected {total} cards so far...")
 
-        logging.info(f"Total cards scraped: {len(all_cards)}")
-        return all_cards
+        logging.info(f"Total cards scraped: {total}")
+
+    def scrape_all_cards(self) -> List[Dict[str, Any]]:
+        """Scrape ALL Yu-Gi-Oh! cards by continuing until API returns empty"""
+        return [card for cards in self.iter_pages() for card in cards]
 
     def scrape_multiple_pages(self, num_pages: int = 5) -> List[Dict[str, Any]]:
         """Scrape specified number of pages of cards"""
-        all_cards = []
-
-        for page in range(num_pages):
-            offset = page * 100
-            logging.info(f"Scraping page {page + 1}/{num_pages} (offset: {offset})")
-
-            cards = self.scrape_page(offset)
-            if cards:
-                all_cards.extend(cards)
-            else:
-                logging.warning(f"No cards found on page {page + 1}")
-                break  # Stop early if no cards found
-
-            # Rate limiting - wait between requests
-            time.sleep(1)
-
-        logging.info(f"Total cards scraped: {len(all_cards)}")
-        return all_cards
+        return [card for cards in self.iter_pages(num_pages) for card in cards]
 
     def validate_card_record(self, card: Dict[str, Any], expected_fields: int = 18) -> bool:
         """Validate that a card record has the correct number of fields"""
@@ -217,70 +335,148 @@ class YGOScraper:
             logging.warning("No cards to save")
             return
 
-        # Flatten all cards
-        flattened_cards = [self.flatten_card_data(card) for card in cards]
-
-        # Define CSV headers
-        headers = [
-            'id', 'name', 'type', 'desc', 'atk', 'def', 'level', 'rank', 'linkval',
-            'race', 'attribute', 'archetype',
-            'cardmarket_price', 'tcgplayer_price', 'amazon_price', 'coolstuffinc_price',
-            'image_url', 'image_url_small'
-        ]
-
-        # Validate all cards before writing
-        valid_cards = []
-        invalid_count = 0
-
-        for card in flattened_cards:
-            if self.validate_card_record(card, len(headers)):
-                valid_cards.append(card)
-            else:
-                invalid_count += 1
-                logging.warning(f"Skipping invalid card record: {card.get('name', 'Unknown')}")
-
-        if invalid_count > 0:
-            logging.warning(f"Skipped {invalid_count} invalid card records due to field count mismatch")
-
-        if not valid_cards:
-            logging.error("No valid cards to save after validation")
-            return
+        self.stream_to_file([cards], filename, 'csv')
 
+    def stream_to_file(self, pages, filename: str, output_format: str = 'store') -> bool:
+        """Write an iterable of card pages as they arrive, so only one page is held in memory"""
         try:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                # Use csv.writer with QUOTE_ALL to ensure proper quoting
-                writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
-
-                # Write header
-                writer.writerow(headers)
+            writer = CardWriter(self, filename, output_format)
+        except Exception as e:
+            logging.error(f"Error opening {filename}: {e}")
+            raise
 
-                # Write card data
-                for card in valid_cards:
-                    # Ensure the order matches headers
-                    row = [card.get(field, '') for field in headers]
-                    writer.writerow(row)
+        try:
+            for cards in pages:
+                writer.write_page(cards)
+        except BaseException as e:
+            # Keep the previous output intact rather than replacing it with a partial crawl
+            logging.error(f"Error saving to {filename}: {e}")
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def card_hash(self, card: Dict[str, Any]) -> str:
+        """Content hash of a flattened card, prices included"""
+        return hashlib.sha1(json.dumps(card, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def load_manifest(self, manifest_path: str) -> Dict[str, str]:
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def emit_delta(self, pages, filename: str, output_format: str = 'store', complete: bool = True,
+                   manifest_path: str = 'data/card_manifest.json',
+                   changelog_path: str = 'data/card_changes.jsonl') -> Dict[str, int]:
+        """Write only the cards whose hash differs from the manifest, plus a change log.
+
+        Added/changed records go to `<filename stem>_delta.<ext>` and every change (removals
+        included) to `changelog_path` as JSON Lines. The full card file is then patched with
+        the delta instead of being rewritten from the crawl. Removals are only detected when
+        `complete` (the crawl reached the end of the data), otherwise unseen cards are kept.
+        """
+        root, ext = os.path.splitext(filename)
+        delta_path = f"{root}_delta{ext}"
+        manifest = self.load_manifest(manifest_path)
+        new_manifest = {}
+        counts = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+        scraped_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+        writer = CardWriter(self, delta_path, output_format)
+        changelog_part = f"{changelog_path}.part"
+        try:
+            with open(changelog_part, 'w', encoding='utf-8') as changelog:
+                def log_change(card_id, name, change, card_hash):
+                    counts[change] += 1
+                    changelog.write(json.dumps({
+                        'id': card_id, 'name': name, 'change': change, 'hash': card_hash, 'scraped_at': scraped_at
+                    }) + '\n')
+
+                for cards in pages:
+                    for card in cards:
+                        card = self.flatten_card_data(card)
+                        card_id = card['id']
+                        if card_id in new_manifest:
+                            continue
+                        card_hash = self.card_hash(card)
+                        previous = manifest.get(card_id)
+                        if previous == card_hash:
+                            new_manifest[card_id] = card_hash
+                            counts['unchanged'] += 1
+                        elif writer.write_record(card):
+                            new_manifest[card_id] = card_hash
+                            log_change(card_id, card['name'], 'added' if previous is None else 'changed', card_hash)
+                        elif previous is not None:
+                            # An invalid record is not a removal, keep the last good version
+                            new_manifest[card_id] = previous
+                    writer.flush()
+                    changelog.flush()
+
+                removed = set()
+                if complete:
+                    removed = set(manifest) - set(new_manifest)
+                    for card_id in sorted(removed):
+                        log_change(card_id, '', 'removed', None)
+                else:
+                    new_manifest = {**manifest, **new_manifest}
+        except BaseException:
+            writer.abort()
+            if os.path.exists(changelog_part):
+                os.remove(changelog_part)
+            raise
 
-            logging.info(f"Successfully saved {len(valid_cards)} cards to {filename} (skipped {invalid_count} invalid)")
+        writer.commit(allow_empty=True)
+        os.replace(changelog_part, changelog_path)
 
-        except Exception as e:
-            logging.error(f"Error saving to CSV: {e}")
+        if counts['added'] or counts['changed'] or counts['removed']:
+            if os.path.exists(filename):
+                self.apply_delta(filename, delta_path, removed, output_format)
+            elif output_format == 'store':
+                shutil.copytree(delta_path, filename)
+            else:
+                shutil.copyfile(delta_path, filename)
+
+        # The manifest moves last: if anything above fails, the next run re-emits the same changes
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(new_manifest, f)
+        os.replace(tmp_path, manifest_path)
+
+        logging.info(
+            f"Delta: {counts['added']} added, {counts['changed']} changed, "
+            f"{counts['removed']} removed, {counts['unchanged']} unchanged"
+        )
+        return counts
+
+    def apply_delta(self, filename: str, delta_path: str, removed, output_format: str = 'store'):
+        """Stream the full card file through, swapping in changed records and appending added ones"""
+        updates = {record['id']: record for record in read_card_records(delta_path, output_format)}
+        writer = CardWriter(self, filename, output_format)
+        try:
+            for record in read_card_records(filename, output_format):
+                if record['id'] in removed:
+                    continue
+                writer.write_record(updates.pop(record['id'], record))
+            for record in updates.values():
+                writer.write_record(record)
+        except BaseException:
+            writer.abort()
             raise
+        writer.commit(allow_empty=True)
 
-    def run(self, num_pages: int = 5):
-        """Run the complete scraping process"""
+    def run(self, num_pages: int = 5, filename: str = 'data/cards.store', output_format: str = 'store',
+            delta: bool = False):
+        """Run the complete scraping process, streaming each page straight to the output file"""
         logging.info("Starting Yu-Gi-Oh! card scraping process")
 
         try:
-            if num_pages is None:
-                # Scrape ALL cards
-                cards = self.scrape_all_cards()
-            else:
-                # Scrape specified number of pages
-                cards = self.scrape_multiple_pages(num_pages)
-
-            if cards:
-                # Save to CSV
-                self.save_to_csv(cards)
+            if delta:
+                # A failed page must not look like the end of the data, or every later card reads as removed
+                pages = self.iter_pages(num_pages, raise_errors=True)
+                self.emit_delta(pages, filename, output_format, complete=num_pages is None)
+                logging.info("Scraping completed successfully")
+            # num_pages=None scrapes ALL cards
+            elif self.stream_to_file(self.iter_pages(num_pages), filename, output_format):
                 logging.info("Scraping completed successfully")
             else:
                 logging.error("No cards were scraped")
@@ -289,6 +485,245 @@ class YGOScraper:
             logging.error(f"Scraping process failed: {e}")
             raise
 
+def retry_after_seconds(value: str, default: float) -> float:
+    """Seconds to wait per a Retry-After header, given as delta-seconds or an HTTP-date; default if absent or unparseable"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return default
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Async token bucket: `rate` requests per second with bursts of up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        import asyncio
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncYGOScraper(YGOScraper):
+    """Concurrent, rate-limited scraper that checkpoints every finished page so runs can resume"""
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, concurrency: int = 4, rate: float = 2.0,
+                 page_size: int = 100, checkpoint_path: str = 'data/scrape_checkpoint.json',
+                 pages_path: str = 'data/scrape_pages.jsonl'):
+        super().__init__(base_url)
+        self.concurrency = concurrency
+        self.rate = rate
+        self.rate_limiter = None
+        self.page_size = page_size
+        self.checkpoint_path = checkpoint_path
+        self.pages_path = pages_path
+
+    def load_checkpoint(self) -> Dict[str, Any]:
+        """Offsets already on disk from an interrupted run, and where the data ended if known"""
+        if not os.path.exists(self.checkpoint_path):
+            return {'completed_offsets': [], 'end_offset': None}
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_checkpoint(self, checkpoint: Dict[str, Any]):
+        # Write-then-rename so a crash never leaves a half-written checkpoint
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    async def fetch_page(self, session, offset: int) -> List[Dict[str, Any]]:
+        """Fetch one page with retries and exponential backoff, honouring Retry-After on 429"""
+        import aiohttp
+        import asyncio
+
+        params = {'num': self.page_size, 'offset': offset}
+        max_retries = 3
+        retry_delay = 2
+
+        for attempt in range(max_retries):
+            with metrics.stage("scrape_rate_limit_wait"):
+                await self.rate_limiter.acquire()
+            try:
+                with metrics.stage("scrape_page"):
+                    async with session.get(self.base_url, params=params, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                        if response.status == 429:
+                            metrics.ITEMS.inc(kind="pages_rate_limited")
+                            wait = retry_after_seconds(response.headers.get('Retry-After'), retry_delay * (2 ** attempt))
+                            logging.warning(f"Rate limited at offset {offset}, waiting {wait:.1f}s")
+                            await asyncio.sleep(wait)
+                            continue
+                        response.raise_for_status()
+                        data = await response.json(content_type=None)
+
+                # An empty page ends the crawl, so a body that is not a page of cards must be retried, not read as empty
+                if not isinstance(data, dict):
+                    raise ValueError(f"Expected a JSON object, got {type(data).__name__}")
+                cards = data.get('data', data.get('cards', []))
+                if not isinstance(cards, list):
+                    raise ValueError(f"Expected a list of cards, got {type(cards).__name__}")
+                logging.info(f"Found {len(cards)} cards on page with offset {offset}")
+                metrics.ITEMS.inc(kind="pages_scraped")
+                metrics.ITEMS.inc(len(cards), kind="cards_scraped")
+                return cards
+
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                # ValueError covers bodies that are not JSON (json.JSONDecodeError) or not a page of cards
+                logging.warning(f"Attempt {attempt + 1} failed for offset {offset}: {e}")
+                if attempt < max_retries - 1:
+                    await asyncio.sleep(retry_delay * (2 ** attempt))
+
+        metrics.ITEMS.inc(kind="pages_failed")
+        raise RuntimeError(f"All attempts failed for offset {offset}")
+
+    async def scrape(self, num_pages: int = None) -> List[Dict[str, Any]]:
+        """Crawl, then return every scraped card in offset order"""
+        end_offset = await self.crawl(num_pages)
+        return [card for cards in self.iter_checkpointed_pages(end_offset) for card in cards]
+
+    async def crawl(self, num_pages: int = None):
+        """Fetch pages in a sliding window of `concurrency` requests, resuming from the checkpoint.
+
+        Pages land in the checkpoint files; returns the offset where the data ended (None if not reached).
+        """
+        import aiohttp
+        import asyncio
+
+        # A fresh bucket per crawl, asyncio locks are bound to the loop that created them
+        self.rate_limiter = TokenBucket(self.rate, capacity=max(1, self.concurrency))
+        checkpoint = self.load_checkpoint()
+        completed = set(checkpoint['completed_offsets'])
+        end_offset = checkpoint['end_offset']
+        if completed:
+            logging.info(f"Resuming scrape: {len(completed)} pages already checkpointed")
+
+        def wanted(offset):
+            if num_pages is not None and offset >= num_pages * self.page_size:
+                return False
+            return end_offset is None or offset < end_offset
+
+        async with aiohttp.ClientSession(headers=self.headers) as session:
+            pending = {}
+            next_offset = 0
+
+            try:
+                while True:
+                    # Keep the window full with offsets that are neither done nor past the end
+                    while len(pending) < self.concurrency and wanted(next_offset):
+                        if next_offset not in completed:
+                            task = asyncio.ensure_future(self.fetch_page(session, next_offset))
+                            pending[task] = next_offset
+                        next_offset += self.page_size
+                    if not pending:
+                        break
+
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        offset = pending.pop(task)
+                        cards = task.result()
+
+                        if not cards:
+                            # The first empty page marks the end of the data
+                            if end_offset is None or offset < end_offset:
+                                end_offset = offset
+                                logging.info(f"No more cards found at offset {offset}")
+                        else:
+                            with open(self.pages_path, 'a', encoding='utf-8') as f:
+                                f.write(json.dumps({'offset': offset, 'cards': cards}) + '\n')
+                        completed.add(offset)
+                        self.save_checkpoint({'completed_offsets': sorted(completed), 'end_offset': end_offset})
+
+                    # Pages scheduled past a newly found end are no longer needed
+                    for task, offset in list(pending.items()):
+                        if not wanted(offset):
+                            task.cancel()
+                            pending.pop(task)
+            finally:
+                # A page that failed after its retries ends the crawl: stop its siblings and collect
+                # their outcomes, so none keeps running or dies with an unretrieved exception
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        return end_offset
+
+    def iter_checkpointed_pages(self, end_offset: int = None):
+        """Yield checkpointed pages in offset order, holding only one page in memory at a time"""
+        if not os.path.exists(self.pages_path):
+            return
+
+        # Pages were appended in completion order; index where each offset's line starts, then seek
+        positions = {}
+        with open(self.pages_path, 'rb') as f:
+            while True:
+                position = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                match = re.match(rb'\{"offset": (\d+)', line)
+                if match and line.endswith(b'\n'):
+                    # A retried page may appear twice, the last copy wins
+                    positions[int(match.group(1))] = position
+
+            total = 0
+            for offset in sorted(positions):
+                if end_offset is not None and offset >= end_offset:
+                    break
+                f.seek(positions[offset])
+                cards = json.loads(f.readline())['cards']
+                total += len(cards)
+                yield cards
+        logging.info(f"Total cards scraped: {total}")
+
+    def clear_checkpoint(self):
+        for path in (self.checkpoint_path, self.pages_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def run(self, num_pages: int = 5, filename: str = 'data/cards.store', output_format: str = 'store',
+            delta: bool = False):
+        """Run the async crawl, then stream the pages out and drop the checkpoint once the file is in place"""
+        import asyncio
+
+        logging.info("Starting async Yu-Gi-Oh! card scraping process")
+        end_offset = asyncio.run(self.crawl(num_pages))
+        pages = self.iter_checkpointed_pages(end_offset)
+        if delta:
+            self.emit_delta(pages, filename, output_format, complete=num_pages is None and end_offset is not None)
+            self.clear_checkpoint()
+            logging.info("Scraping completed successfully")
+        elif self.stream_to_file(pages, filename, output_format):
+            self.clear_checkpoint()
+            logging.info("Scraping completed successfully")
+        else:
+            logging.error("No cards were scraped")
+
+
 def main():
     """Main function to run the scraper"""
     import argparse
@@ -296,20 +731,44 @@ def main():
     parser = argparse.ArgumentParser(description='Yu-Gi-Oh! Card Scraper')
     parser.add_argument('--pages', type=int, help='Number of pages to scrape (default: 5)')
     parser.add_argument('--all', action='store_true', help='Scrape ALL available cards')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Concurrent scraping with resumable checkpoints')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight in async mode (default: 4)')
+    parser.add_argument('--rate', type=float, default=2.0, help='Max requests per second in async mode (default: 2)')
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL, help='Card search endpoint (e.g. a local fixture server)')
+    parser.add_argument('--format', dest='output_format', choices=['store', 'csv', 'jsonl'], default='store', help='Output format (default: store, the columnar card store)')
+    parser.add_argument('--output', help='Output path (default: data/cards.store or data/yugioh_cards.<format>)')
+    parser.add_argument('--delta', action='store_true', help='Only emit cards changed since the last run, plus a change log')
+    parser.add_argument('--metrics-out', default=METRICS_EXPORT_PATH, help='Write Prometheus-format scrape metrics to this file')
 
     args = parser.parse_args()
 
-    scraper = YGOScraper()
+    if args.use_async:
+        scraper = AsyncYGOScraper(args.base_url, concurrency=args.concurrency, rate=args.rate)
+    else:
+        scraper = YGOScraper(args.base_url)
+
+    output = {
+        'filename': args.output or (
+            'data/cards.store' if args.output_format == 'store' else f"data/yugioh_cards.{args.output_format}"
+        ),
+        'output_format': args.output_format,
+        'delta': args.delta
+    }
 
     if args.all:
         print("🃏 Scraping ALL Yu-Gi-Oh! cards...")
-        scraper.run(num_pages=None)  # Explicitly pass None for scraping all cards
+        scraper.run(num_pages=None, **output)  # Explicitly pass None for scraping all cards
     elif args.pages:
         print(f"🃏 Scraping {args.pages} pages...")
-        scraper.run(num_pages=args.pages)
+        scraper.run(num_pages=args.pages, **output)
     else:
         print("🃏 Scraping default 5 pages...")
-        scraper.run()  # Default behavior
+        scraper.run(**output)  # Default behavior
+
+    for name, (calls, seconds) in metrics.stage_totals().items():
+        print(f"{name}: {calls} calls, {seconds:.2f}s total")
+    if args.metrics_out:
+        metrics.write_textfile(args.metrics_out)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -4,28 +4,102 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.data_loader import YuGiOhDataLoader
 from src.vector_store import VectorStoreBuilder
+from src.card_table import CardTable, CardTableWriter
+from src.name_index import CardNameIndex
+from src.card_graph import CardGraph
+from src.lexical_index import BM25Index
+from src.recommender import ATK_FALLBACK_PHRASINGS
+from config.config import CARD_STORE_PATH, PROCESSED_STORE_PATH, CARD_TABLE_PATH, NAME_INDEX_PATH, CARD_GRAPH_PATH, LEXICAL_INDEX_PATH, BUILD_BATCH_SIZE, EMBED_BATCH_SIZE, METRICS_EXPORT_PATH
 from dotenv import load_dotenv
 from utils.logger import get_logger
 from utils.custom_exception import CustomException
+from utils import metrics
 
 load_dotenv()
 
 logger = get_logger(__name__)
 
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build the Yu-Gi-Oh! card index')
+    parser.add_argument('--full', action='store_true', help='Drop the existing index and re-embed every card')
+    parser.add_argument('--stream', action='store_true', help='Stream the raw cards into the index in fixed-size batches')
+    parser.add_argument('--source', help=f'Raw cards: a card store or CSV (default: {CARD_STORE_PATH}, else data/yugioh_cards.csv)')
+    parser.add_argument('--batch-size', type=int, default=BUILD_BATCH_SIZE, help=f'Cards per streaming batch (default: {BUILD_BATCH_SIZE})')
+    parser.add_argument('--workers', type=int, default=1, help='Embedding worker processes (default: 1, in-process)')
+    parser.add_argument('--embed-batch-size', type=int, default=EMBED_BATCH_SIZE, help=f'Texts per worker task (default: {EMBED_BATCH_SIZE})')
+    parser.add_argument('--embedding-cache', help='Enable the on-disk query embedding cache at this path and pre-fill it '
+                                                  'with the fixed fallback phrasings; serve with EMBEDDING_CACHE_PATH set to it')
+    parser.add_argument('--metrics-out', default=METRICS_EXPORT_PATH, help='Write Prometheus-format build metrics to this file')
+    args = parser.parse_args()
+
     try:
         logger.info("Starting to build Yu-Gi-Oh! pipeline...")
 
-        loader = YuGiOhDataLoader("data/yugioh_cards.csv" , "data/yugioh_processed.csv")
-        processed_csv = loader.load_and_process()
+        # The scraper's card store is the canonical input, the CSV export is still accepted
+        source = args.source or (CARD_STORE_PATH if os.path.exists(CARD_STORE_PATH) else "data/yugioh_cards.csv")
+        loader = YuGiOhDataLoader(source , PROCESSED_STORE_PATH)
+        # Load and clean the raw cards once for both the processed store and the card table
+        if not args.stream:
+            cards = loader.load_clean_cards()
+            processed_csv = loader.load_and_process(cards)
+
+            logger.info("Yu-Gi-Oh! card data loaded and processed...")
+
+            loader.build_card_table(CARD_TABLE_PATH, cards)
 
-        logger.info("Yu-Gi-Oh! card data loaded and processed...")
+            logger.info("Yu-Gi-Oh! card stat table built...")
 
-        vector_builder = VectorStoreBuilder(processed_csv)
-        vector_builder.build_and_save_vectorstore()
+        vector_builder = VectorStoreBuilder(
+            "" if args.stream else processed_csv,
+            workers=args.workers,
+            embed_batch_size=args.embed_batch_size,
+            embedding_cache_path=args.embedding_cache
+        )
+        try:
+            if args.stream:
+                # No processed store: chunks go straight from the raw cards to embeddings, and the
+                # card table is filled from the same pass instead of loading every card again
+                card_table_writer = CardTableWriter(CARD_TABLE_PATH)
+                try:
+                    vector_builder.build_streaming(loader, batch_size=args.batch_size, incremental=not args.full,
+                                                   on_chunk=card_table_writer.append)
+                except BaseException:
+                    card_table_writer.abort()
+                    raise
+                card_table_writer.close()
+
+                logger.info(f"Yu-Gi-Oh! card stat table built from the {card_table_writer.rows} streamed cards...")
+            else:
+                vector_builder.build_and_save_vectorstore(incremental=not args.full)
+        finally:
+            vector_builder.close()
 
         logger.info("Yu-Gi-Oh! vector store built successfully...")
 
+        card_table = CardTable.load(CARD_TABLE_PATH)
+        CardNameIndex.from_card_table(card_table).save(NAME_INDEX_PATH)
+
+        logger.info("Yu-Gi-Oh! card name index built...")
+
+        CardGraph.from_card_table(card_table).save(CARD_GRAPH_PATH)
+
+        logger.info("Yu-Gi-Oh! card relationship graph built...")
+
+        BM25Index.from_card_table(card_table).save(LEXICAL_INDEX_PATH)
+
+        logger.info("Yu-Gi-Oh! card BM25 index built...")
+
+        if args.embedding_cache:
+            vector_builder.query_embedding.embed_documents(ATK_FALLBACK_PHRASINGS)
+            logger.info(f"Query embedding cache at {args.embedding_cache} pre-filled: {vector_builder.query_embedding.stats()}")
+
+        metrics.log_stage_totals(logger)
+        if args.metrics_out:
+            metrics.write_textfile(args.metrics_out)
+            logger.info(f"Build metrics written to {args.metrics_out}")
+
         logger.info("Yu-Gi-Oh! pipeline built successfully!")
     except Exception as e:
             logger.error(f"Failed to execute Yu-Gi-Oh! pipeline {str(e)}")
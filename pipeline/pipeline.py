@@ -1,29 +1,82 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from src.vector_store import VectorStoreBuilder
 from src.recommender import YuGiOhRecommender
-from config.config import GROQ_API_KEY,MODEL_NAME
+from src.card_table import CardTable
+from src.name_index import CardNameIndex
+from src.card_graph import CardGraph
+from src.lexical_index import BM25Index
+from src.batch_retriever import BatchRetriever
+from src.answer_cache import AnswerCache
+from src.context_builder import ContextBuilder
+from config.config import GROQ_API_KEY,MODEL_NAME,CARD_TABLE_PATH,NAME_INDEX_PATH,CARD_GRAPH_PATH,LEXICAL_INDEX_PATH,ANSWER_CACHE_SIZE,ANSWER_CACHE_TTL,ANSWER_CACHE_SIMILARITY,INDEX_FIELDS,CONTEXT_TOKEN_BUDGET,RETRIEVAL_WORKERS,BATCH_LLM_WORKERS,METRICS_TRACE_PATH
 from utils.logger import get_logger
 from utils.custom_exception import CustomException
+from utils import metrics
 
 logger = get_logger(__name__)
 
 class YuGiOhRecommendationPipeline:
-    def __init__(self,persist_dir="chroma_db"):
+    def __init__(self,persist_dir="chroma_db",card_table_path=CARD_TABLE_PATH,name_index_path=NAME_INDEX_PATH,card_graph_path=CARD_GRAPH_PATH,lexical_index_path=LEXICAL_INDEX_PATH,llm=None,retrieval_workers=RETRIEVAL_WORKERS,embedding=None):
         try:
             logger.info("Initializing Yu-Gi-Oh! Recommendation Pipeline")
 
-            vector_builder = VectorStoreBuilder(csv_path="" , persist_dir=persist_dir)
+            vector_builder = VectorStoreBuilder(csv_path="" , persist_dir=persist_dir, embedding=embedding)
 
             # Enhanced retriever configuration for better search results
             vector_store = vector_builder.load_vector_store()
-            retriever = vector_store.as_retriever(
-                search_type="similarity_score_threshold",
-                search_kwargs={
-                    "k": 10,  # Retrieve more documents for better matching
-                    "score_threshold": 0.15  # Even lower threshold to catch more relevant matches
-                }
+            self.query_embedding = vector_builder.query_embedding
+            # Batch-capable retriever so fallback phrasings share one embedding pass and one query
+            retriever = BatchRetriever(
+                vector_store,
+                k=10,  # Retrieve more documents for better matching
+                score_threshold=0.15,  # Even lower threshold to catch more relevant matches
+                vectors_per_card=1 + len(INDEX_FIELDS)  # Field vectors are grouped back to one result per card
             )
 
-            self.recommender = YuGiOhRecommender(retriever,GROQ_API_KEY,MODEL_NAME)
+            card_table = None
+            if os.path.exists(card_table_path):
+                card_table = CardTable.load(card_table_path)
+                logger.info(f"Loaded card stat table with {len(card_table)} cards")
+            else:
+                logger.warning(f"Card stat table not found at {card_table_path}, ATK/DEF queries will use semantic search")
+
+            name_index = None
+            if card_table is not None and os.path.exists(name_index_path):
+                name_index = CardNameIndex.load(name_index_path)
+                logger.info(f"Loaded card name index with {len(name_index)} names")
+            else:
+                logger.warning(f"Card name index not found at {name_index_path}, name lookups will use semantic search")
+
+            card_graph = None
+            if name_index is not None and os.path.exists(card_graph_path):
+                card_graph = CardGraph.load(card_graph_path)
+                logger.info(f"Loaded card relationship graph for {len(card_graph.out_edges)} cards")
+            else:
+                logger.warning(f"Card graph not found at {card_graph_path}, 'related to' queries will use semantic search")
+
+            lexical_index = None
+            if card_table is not None and os.path.exists(lexical_index_path):
+                lexical_index = BM25Index.load(lexical_index_path)
+                logger.info(f"Loaded BM25 index over {len(lexical_index)} cards")
+            else:
+                logger.warning(f"BM25 index not found at {lexical_index_path}, retrieval will be dense only")
+
+            # Answers are reused for repeated/near-duplicate questions until the index is rebuilt
+            self.answer_cache = AnswerCache(
+                max_size=ANSWER_CACHE_SIZE,
+                ttl_seconds=ANSWER_CACHE_TTL,
+                similarity_threshold=ANSWER_CACHE_SIMILARITY,
+                embedding=self.query_embedding,
+                version_fn=vector_builder.index_version
+            )
+
+            self.recommender = YuGiOhRecommender(retriever,GROQ_API_KEY,MODEL_NAME,card_table=card_table,name_index=name_index,card_graph=card_graph,lexical_index=lexical_index,answer_cache=self.answer_cache,context_builder=ContextBuilder(card_table,token_budget=CONTEXT_TOKEN_BUDGET),llm=llm)
+
+            # arecommend runs the blocking retrieval on this pool so the event loop only waits on the LLM
+            self.executor = ThreadPoolExecutor(max_workers=retrieval_workers, thread_name_prefix="retrieval")
+            self.retrieval_workers = retrieval_workers
 
             logger.info("Yu-Gi-Oh! Pipeline initialized successfully...")
 
@@ -35,10 +88,111 @@ class YuGiOhRecommendationPipeline:
         try:
             logger.info(f"Received Yu-Gi-Oh! query: {query}")
 
-            recommendation = self.recommender.get_recommendation(query)
+            with metrics.trace("recommend", path=METRICS_TRACE_PATH, query=query):
+                recommendation = self.recommender.get_recommendation(query)
 
             logger.info("Yu-Gi-Oh! recommendation generated successfully...")
+            logger.info(f"Query embedding cache stats: {self.query_embedding.stats()}")
+            logger.info(f"Answer cache stats: {self.answer_cache.stats()}")
             return recommendation
         except Exception as e:
             logger.error(f"Failed to get Yu-Gi-Oh! recommendation {str(e)}")
             raise CustomException("Error during Yu-Gi-Oh! recommendation" , e)
+
+    def recommend_many(self,queries,llm_workers:int=BATCH_LLM_WORKERS) -> list:
+        """Recommend for a list of queries with shared, batched retrieval.
+
+        Returns one {"query", "answer", "error"} dict per query, in input order; a failing query
+        gets its error message instead of failing the whole batch.
+        """
+        try:
+            queries = list(queries)
+            logger.info(f"Received batch of {len(queries)} Yu-Gi-Oh! queries")
+            start = time.perf_counter()
+
+            outcomes = self.recommender.get_recommendations(
+                queries,
+                retrieval_workers=self.retrieval_workers,
+                llm_workers=llm_workers
+            )
+
+            results = []
+            for query, outcome in zip(queries, outcomes):
+                if isinstance(outcome, Exception):
+                    logger.error(f"Failed to get Yu-Gi-Oh! recommendation for {query!r}: {outcome}")
+                    results.append({"query": query, "answer": None, "error": str(outcome)})
+                else:
+                    results.append({"query": query, "answer": outcome, "error": None})
+
+            failed = sum(result["error"] is not None for result in results)
+            logger.info(
+                f"Batch of {len(queries)} queries done in {(time.perf_counter() - start) * 1000:.0f} ms, {failed} failed"
+            )
+            logger.info(f"Query embedding cache stats: {self.query_embedding.stats()}")
+            logger.info(f"Answer cache stats: {self.answer_cache.stats()}")
+            return results
+        except Exception as e:
+            logger.error(f"Failed to run Yu-Gi-Oh! batch recommendation {str(e)}")
+            raise CustomException("Error during Yu-Gi-Oh! batch recommendation" , e)
+
+    async def arecommend(self,query:str) -> str:
+        """Async recommend: retrieval on the pipeline's thread pool, the LLM call awaited on the event loop"""
+        try:
+            logger.info(f"Received Yu-Gi-Oh! query (async): {query}")
+            start = time.perf_counter()
+
+            with metrics.trace("recommend", path=METRICS_TRACE_PATH, query=query):
+                recommendation = await self.recommender.aget_recommendation(query, executor=self.executor)
+
+            logger.info(f"Yu-Gi-Oh! recommendation generated in {(time.perf_counter() - start) * 1000:.0f} ms")
+            return recommendation
+        except Exception as e:
+            logger.error(f"Failed to get Yu-Gi-Oh! recommendation {str(e)}")
+            raise CustomException("Error during Yu-Gi-Oh! recommendation" , e)
+
+    def warm_up(self,query:str="Blue-Eyes White Dragon") -> dict:
+        """Pay the first-use costs (model weights and kernels, Chroma segments, BM25 arrays) before the first user.
+
+        Returns the seconds each step took. The LLM is not called.
+        """
+        timings = {}
+
+        start = time.perf_counter()
+        # The raw model, not the cached wrapper: the point is one real forward pass
+        self.query_embedding.embedding.embed_query(query)
+        timings["warmup_embed_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.recommender.hybrid_search(query)
+        timings["warmup_search_seconds"] = time.perf_counter() - start
+
+        logger.info(f"Yu-Gi-Oh! pipeline warmed up: {timings}")
+        return timings
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    def recommend_stream(self,query:str):
+        """Yield the recommendation in chunks as the LLM generates it"""
+        try:
+            logger.info(f"Received Yu-Gi-Oh! query (streaming): {query}")
+            start = time.perf_counter()
+
+            def chunks():
+                first_chunk = None
+                for chunk in self.recommender.get_recommendation_stream(query):
+                    if first_chunk is None:
+                        first_chunk = time.perf_counter() - start
+                        logger.info(f"First chunk after {first_chunk * 1000:.0f} ms")
+                        metrics.annotate(first_chunk_ms=round(first_chunk * 1000, 2))
+                    yield chunk
+
+            # traced() keeps the trace out of the consumer's context between chunks
+            yield from metrics.traced("recommend_stream", chunks(), path=METRICS_TRACE_PATH, query=query)
+
+            logger.info(f"Yu-Gi-Oh! recommendation streamed in {(time.perf_counter() - start) * 1000:.0f} ms")
+            logger.info(f"Query embedding cache stats: {self.query_embedding.stats()}")
+            logger.info(f"Answer cache stats: {self.answer_cache.stats()}")
+        except Exception as e:
+            logger.error(f"Failed to stream Yu-Gi-Oh! recommendation {str(e)}")
+            raise CustomException("Error during Yu-Gi-Oh! recommendation" , e)
@@ -0,0 +1,67 @@
+import importlib
+import threading
+import time
+from utils.logger import get_logger
+from utils.custom_exception import CustomException
+
+logger = get_logger(__name__)
+
+
+class BackgroundPipeline:
+    """Imports, builds and warms up the recommendation pipeline on a background thread.
+
+    Only this module is imported up front: langchain, chromadb, sentence-transformers and torch
+    load inside the thread, so a UI can render while they do.
+    """
+
+    def __init__(self, warm_up: bool = True, **pipeline_kwargs):
+        self.warm_up = warm_up
+        self.pipeline_kwargs = pipeline_kwargs
+        self.pipeline = None
+        self.error = None
+        self.timings = {}
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self) -> "BackgroundPipeline":
+        if self._thread is None:
+            self._started = time.perf_counter()
+            self._thread = threading.Thread(target=self._load, name="pipeline-warm-start", daemon=True)
+            self._thread.start()
+        return self
+
+    def _load(self):
+        try:
+            start = time.perf_counter()
+            module = importlib.import_module("pipeline.pipeline")
+            self.timings["import_seconds"] = round(time.perf_counter() - start, 3)
+
+            start = time.perf_counter()
+            pipeline = module.YuGiOhRecommendationPipeline(**self.pipeline_kwargs)
+            self.timings["init_seconds"] = round(time.perf_counter() - start, 3)
+
+            if self.warm_up:
+                self.timings.update({key: round(value, 3) for key, value in pipeline.warm_up().items()})
+
+            self.timings["ready_seconds"] = round(time.perf_counter() - self._started, 3)
+            self.pipeline = pipeline
+            logger.info(f"Yu-Gi-Oh! pipeline ready in the background: {self.timings}")
+        except Exception as e:
+            logger.error(f"Background pipeline start failed {str(e)}")
+            self.error = e
+        finally:
+            self._done.set()
+
+    @property
+    def status(self) -> str:
+        if not self._done.is_set():
+            return "warming_up"
+        return "failed" if self.error is not None else "ready"
+
+    def wait(self, timeout: float = None):
+        """Block until the pipeline is ready and return it"""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Pipeline not ready after {timeout}s")
+        if self.error is not None:
+            raise CustomException("Error during Yu-Gi-Oh! pipeline initialization", self.error)
+        return self.pipeline
@@ -0,0 +1,136 @@
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    query = re.sub(r'\s+', ' ', query.lower()).strip()
+    return query.rstrip('?!. ')
+
+
+def fingerprint_documents(docs) -> str:
+    """Order-independent fingerprint of a retrieved document set"""
+    digests = sorted(
+        hashlib.sha1(doc.page_content.encode('utf-8')).hexdigest()
+        for doc in docs or []
+    )
+    return hashlib.sha1('\n'.join(digests).encode('utf-8')).hexdigest()
+
+
+def _cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class AnswerCache:
+    """TTL + LRU cache of LLM answers keyed on normalized query and retrieved document set"""
+
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 3600, similarity_threshold: float = 0.95,
+                 embedding=None, version_fn=None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.embedding = embedding
+        self.version_fn = version_fn
+
+        self._entries = OrderedDict()  # (query, fingerprint) -> (answer, vector, expires_at)
+        self._by_fingerprint = {}  # fingerprint -> set of keys, for near-duplicate matching
+        self._version = version_fn() if version_fn else None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            # The vector store was rebuilt, every cached answer may be stale
+            self._entries.clear()
+            self._by_fingerprint.clear()
+            self._version = version
+
+    def _vector(self, query: str):
+        if self.embedding is None or self.similarity_threshold is None:
+            return None
+        return self.embedding.embed_query(query)
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        keys = self._by_fingerprint.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_fingerprint[key[1]]
+
+    def lookup(self, query: str, docs):
+        """Return a cached answer for this query and document set, or None"""
+        fingerprint = fingerprint_documents(docs)
+        key = (normalize_query(query), fingerprint)
+        now = time.monotonic()
+
+        with self._lock:
+            self._check_version()
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[2] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._drop(key)
+
+            candidates = list(self._by_fingerprint.get(fingerprint, ()))
+
+        if candidates:
+            vector = self._vector(query)
+            if vector is not None:
+                with self._lock:
+                    for candidate in candidates:
+                        entry = self._entries.get(candidate)
+                        if entry is None or entry[1] is None or entry[2] <= now:
+                            continue
+                        if _cosine(vector, entry[1]) >= self.similarity_threshold:
+                            self._entries.move_to_end(candidate)
+                            self.hits += 1
+                            self.near_hits += 1
+                            return entry[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(self, query: str, docs, answer: str):
+        fingerprint = fingerprint_documents(docs)
+        key = (normalize_query(query), fingerprint)
+        vector = self._vector(query)
+
+        with self._lock:
+            self._check_version()
+            self._drop(key)
+            self._entries[key] = (answer, vector, time.monotonic() + self.ttl_seconds)
+            self._by_fingerprint.setdefault(fingerprint, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_fingerprint.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+        }
@@ -0,0 +1,105 @@
+import json
+from langchain_core.documents import Document
+from utils import metrics
+
+
+def metadata_filter(stat_query) -> dict:
+    """Translate the categorical parts of a parsed query into a Chroma `where` prefilter"""
+    conditions = [{field: value} for field, value in stat_query.categories.items()]
+    conditions += [{flag: True} for flag in stat_query.flags]
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+
+def _filter_key(where: dict) -> str:
+    return json.dumps(where, sort_keys=True) if where else ""
+
+
+class BatchRetriever:
+    """Similarity-threshold retriever over a Chroma store that can search many queries at once.
+
+    Results are grouped by card: each card is returned once, from its best matching vector.
+    """
+
+    def __init__(self, vector_store, k: int = 10, score_threshold: float = 0.15, vectors_per_card: int = 1):
+        self.vector_store = vector_store
+        self.k = k
+        self.score_threshold = score_threshold
+        # Over-fetch by the number of vectors a card can have, so grouping still leaves k cards
+        self.vectors_per_card = vectors_per_card
+        # Results searched ahead of time by prefetch(), keyed by (query text, prefilter)
+        self._prefetched = {}
+
+    def invoke(self, query: str, where: dict = None):
+        """Drop-in replacement for VectorStoreRetriever.invoke, with an optional metadata prefilter"""
+        return self.batch_invoke([query], where=where)[0]
+
+    def batch_invoke(self, queries, where: dict = None):
+        """Embed every query in one forward pass and search them in one collection query"""
+        if not queries:
+            return []
+
+        queries = list(queries)
+        key = _filter_key(where)
+        missing = [query for query in dict.fromkeys(queries) if (query, key) not in self._prefetched]
+        found = {}
+        if missing:
+            with metrics.stage("embed_query"):
+                embeddings = self.vector_store.embeddings.embed_documents(missing)
+            found = dict(zip(missing, self.search_by_vectors(embeddings, where=where)))
+        return [list(self._prefetched[(query, key)]) if (query, key) in self._prefetched else found[query]
+                for query in queries]
+
+    def prefetch(self, queries, where: dict = None, batch_size: int = 256):
+        """Embed and search many queries in large batches; later invokes with the same prefilter are served from memory"""
+        key = _filter_key(where)
+        missing = [query for query in dict.fromkeys(queries) if (query, key) not in self._prefetched]
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            for query, docs in zip(batch, self.batch_invoke(batch, where=where)):
+                self._prefetched[(query, key)] = docs
+        return len(missing)
+
+    def clear_prefetched(self):
+        self._prefetched = {}
+
+    def search_by_vectors(self, embeddings, where: dict = None):
+        """Run one multi-vector Chroma query and return one document list per vector"""
+        kwargs = {"where": where} if where else {}
+        with metrics.stage("vector_search"):
+            results = self.vector_store._collection.query(
+                query_embeddings=embeddings,
+                n_results=self.k * self.vectors_per_card,
+                include=["documents", "metadatas", "distances"],
+                **kwargs
+            )
+        relevance_fn = self.vector_store._select_relevance_score_fn()
+
+        batched_docs = []
+        for documents, metadatas, ids, distances in zip(
+            results["documents"], results["metadatas"], results["ids"], results["distances"]
+        ):
+            docs = []
+            seen = set()
+            # Hits come back closest first, so the first hit of a card is its best one
+            for content, metadata, doc_id, distance in zip(documents, metadatas, ids, distances):
+                if content is None:
+                    continue
+                # Same cut-off as search_type="similarity_score_threshold"
+                if relevance_fn(distance) < self.score_threshold:
+                    continue
+                metadata = metadata or {}
+                card_id = metadata.get("card_id", doc_id)
+                if card_id in seen:
+                    continue
+                seen.add(card_id)
+                docs.append(Document(page_content=content, metadata=metadata, id=card_id))
+                if len(docs) == self.k:
+                    break
+            batched_docs.append(docs)
+
+        return batched_docs
@@ -0,0 +1,134 @@
+import json
+import re
+from src.name_index import normalize_name
+
+# Quoted card names inside effect text, as written by the scraper ("" doubled quotes)
+MENTION_PATTERN = re.compile(r'""([^"]+)""')
+# A quoted name directly next to a "+" in a Fusion Monster's text is one of its materials
+MATERIAL_PATTERN = re.compile(r'""([^"]+)""\s*\+|\+\s*""([^"]+)""')
+
+# Lower ranks first when ordering neighbours: a card's own materials before looser mentions and archetype mates
+RELATION_PRIORITY = {
+    'fusion_material': 0,
+    'fusion_of': 1,
+    'mentions': 2,
+    'mentioned_by': 3,
+    'same_archetype': 4,
+}
+
+_INVERSE = {
+    'fusion_material': 'fusion_of',
+    'mentions': 'mentioned_by',
+}
+
+
+class CardGraph:
+    """Adjacency lists (out and in edges) between card table rows, plus archetype membership"""
+
+    def __init__(self, out_edges: dict, in_edges: dict, archetypes: dict, row_archetypes: dict):
+        self.out_edges = out_edges  # row -> [[target_row, relation], ...]
+        self.in_edges = in_edges  # row -> [[source_row, relation], ...]
+        self.archetypes = archetypes  # archetype -> [rows]
+        self.row_archetypes = row_archetypes  # row -> [archetypes it belongs to or mentions]
+
+    @classmethod
+    def from_card_table(cls, card_table) -> "CardGraph":
+        names = card_table.text['name']
+        descs = card_table.text['desc']
+        fusion = card_table.flags['is_fusion']
+
+        rows_by_name = {}
+        for row, name in enumerate(names):
+            rows_by_name.setdefault(normalize_name(name), row)
+
+        archetypes = {}
+        row_archetypes = {}
+        archetype_vocab = card_table.vocabularies['archetype']
+        for row, code in enumerate(card_table.categories['archetype']):
+            if code >= 0:
+                archetype = archetype_vocab[code]
+                archetypes.setdefault(archetype, []).append(row)
+                row_archetypes.setdefault(row, []).append(archetype)
+        archetype_by_name = {normalize_name(archetype): archetype for archetype in archetypes}
+
+        out_edges = {}
+        in_edges = {}
+
+        def add_edge(source, target, relation):
+            if source == target or [target, relation] in out_edges.get(source, []):
+                return
+            out_edges.setdefault(source, []).append([target, relation])
+            in_edges.setdefault(target, []).append([source, relation])
+
+        for row, desc in enumerate(descs):
+            if not desc:
+                continue
+
+            materials = set()
+            if fusion[row] and '+' in desc:
+                for match in MATERIAL_PATTERN.finditer(desc):
+                    materials.add(normalize_name(match.group(1) or match.group(2)))
+
+            for mentioned in MENTION_PATTERN.findall(desc):
+                key = normalize_name(mentioned)
+                target = rows_by_name.get(key)
+                if target is not None:
+                    add_edge(row, target, 'fusion_material' if key in materials else 'mentions')
+                elif key in archetype_by_name:
+                    # "Fiendsmith" in quotes refers to the whole archetype, not a single card
+                    archetype = archetype_by_name[key]
+                    if archetype not in row_archetypes.get(row, []):
+                        row_archetypes.setdefault(row, []).append(archetype)
+
+        return cls(out_edges, in_edges, archetypes, row_archetypes)
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "out": self.out_edges,
+                "in": self.in_edges,
+                "archetypes": self.archetypes,
+                "row_archetypes": self.row_archetypes,
+            }, f)
+
+    @classmethod
+    def load(cls, path: str) -> "CardGraph":
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        # JSON object keys are strings, the graph is keyed on int rows
+        return cls(
+            {int(row): edges for row, edges in data["out"].items()},
+            {int(row): edges for row, edges in data["in"].items()},
+            data["archetypes"],
+            {int(row): archetypes for row, archetypes in data["row_archetypes"].items()},
+        )
+
+    def neighbours(self, row: int):
+        """Directly linked rows as (row, relation), most specific relation first"""
+        linked = list(self.out_edges.get(row, []))
+        linked += [[source, _INVERSE.get(relation, relation)] for source, relation in self.in_edges.get(row, [])]
+        for archetype in self.row_archetypes.get(row, []):
+            linked += [[peer, 'same_archetype'] for peer in self.archetypes.get(archetype, [])]
+
+        seen = {row}
+        result = []
+        for target, relation in sorted(linked, key=lambda edge: RELATION_PRIORITY.get(edge[1], 99)):
+            if target not in seen:
+                seen.add(target)
+                result.append((target, relation))
+        return result
+
+    def related(self, row: int, hops: int = 1, limit: int = 15):
+        """Rows related to `row` as (row, relation, hop), optionally expanded to 2 hops"""
+        result = [(target, relation, 1) for target, relation in self.neighbours(row)]
+        if hops >= 2:
+            seen = {row} | {target for target, _, _ in result}
+            for target, relation, _ in list(result):
+                if relation == 'same_archetype':
+                    # Archetype peers already cover each other, expanding them only adds noise
+                    continue
+                for second, second_relation in self.neighbours(target):
+                    if second not in seen:
+                        seen.add(second)
+                        result.append((second, second_relation, 2))
+        return result[:limit]
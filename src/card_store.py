@@ -0,0 +1,266 @@
+import json
+import math
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+SCHEMA_FILE = "schema.json"
+
+# Typed columns of a scraped card, in the scraper's field order
+RAW_CARD_SCHEMA = {
+    'id': 'str',
+    'name': 'str',
+    'type': 'str',
+    'desc': 'str',
+    'atk': 'int32',
+    'def': 'int32',
+    'level': 'int32',
+    'rank': 'int32',
+    'linkval': 'int32',
+    'race': 'str',
+    'attribute': 'str',
+    'archetype': 'str',
+    'cardmarket_price': 'float64',
+    'tcgplayer_price': 'float64',
+    'amazon_price': 'float64',
+    'coolstuffinc_price': 'float64',
+    'image_url': 'str',
+    'image_url_small': 'str',
+}
+
+
+def is_card_store(path: str) -> bool:
+    """Card stores are directories; anything else is treated as a CSV/JSONL file"""
+    return os.path.isdir(path) or path.endswith('.store')
+
+
+def _to_number(value, dtype: str):
+    """'', None, 'None' and NaN become 0 (ints) or NaN (floats), as the CSV cleaning step did"""
+    missing = 0 if dtype.startswith('int') else math.nan
+    if value is None or value == '' or value == 'None':
+        return missing
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return missing
+    if math.isnan(number):
+        return missing
+    return int(number) if dtype.startswith('int') else number
+
+
+def _to_text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ''
+        # pandas turns an int column with gaps into floats; keep ids as '12345', not '12345.0'
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+
+class StringColumn:
+    """Read-only view over a UTF-8 heap plus offsets; strings are decoded only when accessed"""
+
+    def __init__(self, heap: np.ndarray, offsets: np.ndarray):
+        self.heap = heap
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return self.to_list(start, stop)
+            return [self[i] for i in range(start, stop, step)]
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.heap[start:end].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def to_list(self, start: int = 0, stop: int = None) -> list:
+        stop = len(self) if stop is None else stop
+        offsets = self.offsets[start:stop + 1].tolist()
+        if not offsets:
+            return []
+        # One copy of the byte range, then slice it per string
+        base = offsets[0]
+        heap = self.heap[base:offsets[-1]].tobytes()
+        return [heap[a - base:b - base].decode('utf-8') for a, b in zip(offsets, offsets[1:])]
+
+
+class CardStore:
+    """Directory of memory-mapped typed columns: one raw file per column plus a JSON schema.
+
+    Opening a store reads only the schema; each column is mapped on first access, so a
+    process that needs the stats never touches the description heap.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, SCHEMA_FILE), encoding='utf-8') as f:
+            schema = json.load(f)
+        self.rows = schema['rows']
+        self.dtypes = schema['columns']
+        self.attrs = schema.get('attrs', {})
+        self._columns = {}
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def columns(self) -> list:
+        return list(self.dtypes)
+
+    def _map(self, filename: str, dtype: str) -> np.ndarray:
+        path = os.path.join(self.path, filename)
+        if os.path.getsize(path) == 0:
+            # mmap cannot map an empty file
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r')
+
+    def column(self, name: str):
+        """A numeric column as a read-only memmap, or a text column as a StringColumn"""
+        column = self._columns.get(name)
+        if column is None:
+            dtype = self.dtypes[name]
+            # Cut to the schema's row count: a store still being written may hold rows appended since
+            if dtype == 'str':
+                offsets = self._map(f"{name}.offsets", 'int64')[:self.rows + 1]
+                column = StringColumn(self._map(f"{name}.heap", 'uint8'), offsets)
+            else:
+                column = self._map(f"{name}.bin", dtype)[:self.rows]
+            self._columns[name] = column
+        return column
+
+    def to_dataframe(self, columns=None, start: int = 0, stop: int = None) -> pd.DataFrame:
+        """Materialize a row range of the selected columns"""
+        stop = self.rows if stop is None else min(stop, self.rows)
+        data = {}
+        for name in columns or self.columns:
+            column = self.column(name)
+            if isinstance(column, StringColumn):
+                data[name] = column.to_list(start, stop)
+            else:
+                data[name] = np.array(column[start:stop])
+        return pd.DataFrame(data, index=pd.RangeIndex(start, stop))
+
+    def iter_dataframes(self, batch_size: int, columns=None):
+        for start in range(0, self.rows, batch_size):
+            yield self.to_dataframe(columns, start, start + batch_size)
+
+    def iter_records(self, columns=None, batch_size: int = 1024):
+        for df in self.iter_dataframes(batch_size, columns):
+            yield from df.to_dict('records')
+
+
+class CardStoreWriter:
+    """Appends batches of rows to a new card store and swaps it into place on close()"""
+
+    def __init__(self, path: str, schema: dict):
+        self.path = path
+        self.schema = dict(schema)
+        self.part_path = f"{path}.part"
+        self.rows = 0
+
+        if os.path.exists(self.part_path):
+            shutil.rmtree(self.part_path)
+        os.makedirs(self.part_path)
+
+        self._files = {}
+        self._heap_sizes = {}
+        for name, dtype in self.schema.items():
+            if dtype == 'str':
+                self._files[f"{name}.heap"] = open(os.path.join(self.part_path, f"{name}.heap"), 'wb')
+                offsets = open(os.path.join(self.part_path, f"{name}.offsets"), 'wb')
+                np.zeros(1, dtype=np.int64).tofile(offsets)
+                self._files[f"{name}.offsets"] = offsets
+                self._heap_sizes[name] = 0
+            else:
+                self._files[f"{name}.bin"] = open(os.path.join(self.part_path, f"{name}.bin"), 'wb')
+
+    def append(self, columns: dict):
+        """Append equally long sequences of values, one per schema column"""
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) != 1 or set(columns) != set(self.schema):
+            raise ValueError("append() needs one equally long sequence for every schema column")
+
+        for name, dtype in self.schema.items():
+            values = columns[name]
+            if dtype == 'str':
+                encoded = [_to_text(value).encode('utf-8') for value in values]
+                sizes = np.fromiter((len(value) for value in encoded), dtype=np.int64, count=len(encoded))
+                offsets = self._heap_sizes[name] + np.cumsum(sizes)
+                self._files[f"{name}.heap"].write(b''.join(encoded))
+                offsets.tofile(self._files[f"{name}.offsets"])
+                if len(offsets):
+                    self._heap_sizes[name] = int(offsets[-1])
+            elif dtype == 'bool' or (isinstance(values, np.ndarray) and values.dtype.kind in 'iub'):
+                # Already typed (no missing values to translate), write as is
+                np.asarray(values, dtype=dtype).tofile(self._files[f"{name}.bin"])
+            else:
+                numbers = [_to_number(value, dtype) for value in values]
+                np.asarray(numbers, dtype=dtype).tofile(self._files[f"{name}.bin"])
+
+        self.rows += lengths.pop()
+
+    def append_records(self, records):
+        records = list(records)
+        if records:
+            self.append({name: [record.get(name) for record in records] for name in self.schema})
+
+    def _write_schema(self, attrs: dict = None):
+        # Write-then-rename, so a reader never sees a half-written schema
+        tmp_path = os.path.join(self.part_path, f"{SCHEMA_FILE}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"rows": self.rows, "columns": self.schema, "attrs": attrs or {}}, f)
+        os.replace(tmp_path, os.path.join(self.part_path, SCHEMA_FILE))
+
+    def flush(self):
+        """Make the rows appended so far readable: CardStore(part_path) opens them while writing goes on"""
+        # Column data first, then the row count that covers it
+        for f in self._files.values():
+            f.flush()
+        self._write_schema()
+
+    def close(self, attrs: dict = None):
+        for f in self._files.values():
+            f.close()
+        self._write_schema(attrs)
+
+        # A directory cannot be os.replace'd over a non-empty one: move the old store aside first
+        old_path = f"{self.path}.old"
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+        if os.path.exists(self.path):
+            os.rename(self.path, old_path)
+        os.rename(self.part_path, self.path)
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+
+    def abort(self):
+        for f in self._files.values():
+            f.close()
+        shutil.rmtree(self.part_path, ignore_errors=True)
+
+
+def write_dataframe(df: pd.DataFrame, path: str, schema: dict, attrs: dict = None, batch_size: int = 4096):
+    """Write the schema columns of a DataFrame as a card store"""
+    writer = CardStoreWriter(path, schema)
+    try:
+        for start in range(0, len(df), batch_size):
+            batch = df.iloc[start:start + batch_size]
+            writer.append({name: batch[name].tolist() for name in schema})
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close(attrs)
+    return path
@@ -0,0 +1,456 @@
+import re
+import numpy as np
+import pandas as pd
+from src.card_store import CardStore, CardStoreWriter
+
+NUMERIC_FIELDS = ['atk', 'def', 'level', 'rank', 'linkval']
+CATEGORY_FIELDS = ['attribute', 'race', 'archetype']
+TEXT_FIELDS = ['id', 'name', 'type', 'desc']
+
+# Flag columns derived from the card type string ("Synchro Tuner Effect Monster", ...)
+TYPE_FLAGS = {
+    'is_monster': ['monster', 'token'],
+    'is_spell': ['spell'],
+    'is_trap': ['trap'],
+    'is_fusion': ['fusion'],
+    'is_synchro': ['synchro'],
+    'is_xyz': ['xyz'],
+    'is_link': ['link'],
+    'is_ritual': ['ritual monster', 'ritual effect monster'],
+    'is_pendulum': ['pendulum'],
+    'is_tuner': ['tuner'],
+    'is_effect': ['effect'],
+    'is_normal': ['normal monster'],
+}
+
+
+class CardTable:
+    """Columnar, NumPy-backed view of the cleaned card data for exact stat filtering"""
+
+    def __init__(self, numeric: dict, categories: dict, vocabularies: dict, flags: dict, text: dict):
+        self.numeric = numeric
+        self.categories = categories
+        self.vocabularies = vocabularies
+        self.flags = flags
+        self.text = text
+        self._category_lookup = {
+            field: {value.lower(): code for code, value in enumerate(vocab)}
+            for field, vocab in vocabularies.items()
+        }
+
+    def __len__(self):
+        return len(self.text['name'])
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "CardTable":
+        """Build the table from a DataFrame cleaned by YuGiOhDataLoader.clean_card_data"""
+        numeric, values, flags, text = _table_columns(df)
+
+        categories = {}
+        vocabularies = {}
+        for field, column in values.items():
+            vocab = sorted(set(column) - {''})
+            lookup = {value: code for code, value in enumerate(vocab)}
+            categories[field] = column.map(lambda v: lookup.get(v, -1)).to_numpy(dtype=np.int32)
+            vocabularies[field] = vocab
+
+        return cls(numeric, categories, vocabularies, flags, text)
+
+    def save(self, path: str):
+        """Persist the table as a card store directory (strings are stored as UTF-8 heaps)"""
+        writer = CardStoreWriter(path, _STORE_SCHEMA)
+        try:
+            writer.append(_store_columns(self.numeric, self.categories, self.flags, self.text))
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close({"vocabularies": self.vocabularies})
+
+    @classmethod
+    def load(cls, path: str) -> "CardTable":
+        """Memory-map the table; text columns are decoded lazily, row by row"""
+        store = CardStore(path)
+        numeric = {field: store.column(f"numeric__{field}") for field in NUMERIC_FIELDS}
+        categories = {field: store.column(f"category__{field}") for field in CATEGORY_FIELDS}
+        vocabularies = {field: store.attrs["vocabularies"][field] for field in CATEGORY_FIELDS}
+        flags = {flag: store.column(f"flag__{flag}") for flag in TYPE_FLAGS}
+        text = {field: store.column(f"text__{field}") for field in TEXT_FIELDS}
+        return cls(numeric, categories, vocabularies, flags, text)
+
+    def mask(self, stat_query: "StatQuery") -> np.ndarray:
+        """Combine every constraint of the query into one boolean mask"""
+        mask = np.ones(len(self), dtype=bool)
+
+        if stat_query.numeric:
+            # Stat constraints only make sense for monsters
+            mask &= self.flags['is_monster']
+        for field, op, value in stat_query.numeric:
+            mask &= _COMPARATORS[op](self.numeric[field], value)
+            if field in ('level', 'rank', 'linkval'):
+                # A Link monster has no Level, it does not have "Level 0"
+                mask &= self.numeric[field] > 0
+
+        for field, value in stat_query.categories.items():
+            code = self._category_lookup[field].get(value.lower())
+            if code is None:
+                return np.zeros(len(self), dtype=bool)
+            mask &= self.categories[field] == code
+
+        for flag in stat_query.flags:
+            mask &= self.flags[flag]
+
+        return mask
+
+    def query(self, stat_query: "StatQuery", limit: int = None) -> np.ndarray:
+        """Return the row indices matching the query, sorted by the query's sort field"""
+        indices = np.flatnonzero(self.mask(stat_query))
+        if len(indices) == 0:
+            return indices
+
+        keys = self.numeric[stat_query.sort_field][indices]
+        if stat_query.descending:
+            keys = -keys.astype(np.int64)
+        order = np.argsort(keys, kind='stable')
+        indices = indices[order]
+
+        if limit is not None:
+            indices = indices[:limit]
+        return indices
+
+    def record(self, index: int) -> dict:
+        """Return a plain dict for a single card row"""
+        record = {field: self.text[field][index] for field in TEXT_FIELDS}
+        for field in CATEGORY_FIELDS:
+            code = self.categories[field][index]
+            record[field] = self.vocabularies[field][code] if code >= 0 else ''
+        for field in NUMERIC_FIELDS:
+            record[field] = int(self.numeric[field][index])
+        record['is_monster'] = bool(self.flags['is_monster'][index])
+        return record
+
+    def render(self, index: int) -> str:
+        """Render a card row as plain text for the LLM context"""
+        card = self.record(index)
+        parts = [f"Card Name: {card['name']}", f"Card Type: {card['type']}"]
+        if card['race']:
+            parts.append(f"Race: {card['race']}")
+        if card['attribute']:
+            parts.append(f"Attribute: {card['attribute']}")
+        if card['is_monster']:
+            if card['level']:
+                parts.append(f"Level: {card['level']}")
+            elif card['rank']:
+                parts.append(f"Rank: {card['rank']}")
+            elif card['linkval']:
+                parts.append(f"Link: {card['linkval']}")
+            parts.append(f"ATK: {card['atk']}")
+            if not card['linkval']:
+                parts.append(f"DEF: {card['def']}")
+        if card['archetype']:
+            parts.append(f"Archetype: {card['archetype']}")
+        if card['desc']:
+            parts.append(f"Effect: {card['desc']}")
+        return ' '.join(parts)
+
+
+# Card store layout of a saved table
+_STORE_SCHEMA = {
+    **{f"numeric__{field}": 'int32' for field in NUMERIC_FIELDS},
+    **{f"category__{field}": 'int32' for field in CATEGORY_FIELDS},
+    **{f"flag__{flag}": 'bool' for flag in TYPE_FLAGS},
+    **{f"text__{field}": 'str' for field in TEXT_FIELDS},
+}
+
+
+def _table_columns(df: pd.DataFrame):
+    """Numeric, raw category, flag and text columns of a cleaned DataFrame"""
+    numeric = {
+        field: df[field].fillna(0).to_numpy(dtype=np.int32)
+        for field in NUMERIC_FIELDS
+    }
+
+    values = {field: df[field].fillna('').astype(str).str.strip() for field in CATEGORY_FIELDS}
+
+    type_lower = df['type'].fillna('').astype(str).str.lower()
+    flags = {}
+    for flag, keywords in TYPE_FLAGS.items():
+        mask = np.zeros(len(df), dtype=bool)
+        for keyword in keywords:
+            mask |= type_lower.str.contains(keyword, regex=False).to_numpy(dtype=bool)
+        flags[flag] = mask
+
+    text = {
+        field: np.array(df[field].fillna('').astype(str).tolist(), dtype=object)
+        for field in TEXT_FIELDS
+    }
+    return numeric, values, flags, text
+
+
+def _store_columns(numeric: dict, categories: dict, flags: dict, text: dict) -> dict:
+    columns = {}
+    columns.update({f"numeric__{field}": values for field, values in numeric.items()})
+    columns.update({f"category__{field}": codes for field, codes in categories.items()})
+    columns.update({f"flag__{flag}": values for flag, values in flags.items()})
+    columns.update({f"text__{field}": list(values) for field, values in text.items()})
+    return columns
+
+
+class CardTableWriter:
+    """Builds a saved card table from cleaned DataFrame chunks, e.g. the batches of a streaming build.
+
+    The vocabularies are only complete at the end, so category codes are assigned in first-seen
+    order instead of the sorted order from_dataframe uses; lookups go through the vocabulary either way.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self._vocabularies = {field: [] for field in CATEGORY_FIELDS}
+        self._lookups = {field: {} for field in CATEGORY_FIELDS}
+        self._writer = CardStoreWriter(path, _STORE_SCHEMA)
+
+    def append(self, df: pd.DataFrame):
+        numeric, values, flags, text = _table_columns(df)
+
+        categories = {}
+        for field, column in values.items():
+            lookup = self._lookups[field]
+            for value in column.unique():
+                if value and value not in lookup:
+                    lookup[value] = len(self._vocabularies[field])
+                    self._vocabularies[field].append(value)
+            categories[field] = column.map(lambda v: lookup.get(v, -1)).to_numpy(dtype=np.int32)
+
+        self._writer.append(_store_columns(numeric, categories, flags, text))
+        self.rows += len(df)
+
+    def close(self) -> str:
+        self._writer.close({"vocabularies": self._vocabularies})
+        return self.path
+
+    def abort(self):
+        self._writer.abort()
+
+
+_COMPARATORS = {
+    '>=': np.greater_equal,
+    '>': np.greater,
+    '<=': np.less_equal,
+    '<': np.less,
+    '==': np.equal,
+}
+
+
+class StatQuery:
+    """Structured constraints parsed from a natural-language query"""
+
+    def __init__(self):
+        self.numeric = []  # (field, op, value)
+        self.categories = {}  # field -> value
+        self.flags = []
+        self.sort_field = 'atk'
+        self.descending = True
+
+    def is_stat_query(self) -> bool:
+        """True when the query has at least one numeric stat constraint"""
+        return bool(self.numeric)
+
+    def __repr__(self):
+        return (f"StatQuery(numeric={self.numeric}, categories={self.categories}, "
+                f"flags={self.flags}, sort={self.sort_field}{' desc' if self.descending else ''})")
+
+
+_STAT_WORDS = {
+    'atk': 'atk', 'attack': 'atk',
+    'def': 'def', 'defense': 'def', 'defence': 'def',
+    'level': 'level', 'lvl': 'level', 'lv': 'level',
+    'rank': 'rank',
+    'link': 'linkval',
+}
+
+_PREFIX_OPS = {
+    'at least': '>=', 'minimum': '>=', 'min': '>=', '>=': '>=',
+    'over': '>', 'above': '>', 'more than': '>', 'greater than': '>', 'higher than': '>', '>': '>',
+    'under': '<', 'below': '<', 'less than': '<', 'lower than': '<', '<': '<',
+    'at most': '<=', 'maximum': '<=', 'max': '<=', 'up to': '<=', '<=': '<=',
+    'exactly': '==', '=': '==',
+}
+
+_SUFFIX_OPS = {
+    'or more': '>=', 'or higher': '>=', 'or greater': '>=', 'or above': '>=', 'and up': '>=',
+    'and above': '>=', '+': '>=',
+    'or less': '<=', 'or lower': '<=', 'or below': '<=', 'or fewer': '<=', 'and below': '<=',
+    'and under': '<=',
+}
+
+
+def _alternation(words) -> str:
+    # Longest first so "at least" wins over "at"
+    return '|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+
+_STAT = rf"(?P<stat>{_alternation(_STAT_WORDS)})"
+_NUM = r"(?P<num>\d{1,2},\d{3}|\d+)"
+_PRE = rf"(?:(?P<pre>{_alternation(_PREFIX_OPS)})\s*)?"
+_POST = rf"(?:\s*(?P<post>{_alternation(_SUFFIX_OPS)}))?"
+
+# "at least 2500 ATK", "3000+ ATK", "1500 or less ATK", "2500 ATK or higher"
+_NUMBER_FIRST = re.compile(
+    rf"{_PRE}{_NUM}(?:\s*(?P<mid>{_alternation(_SUFFIX_OPS)}))?\s*{_STAT}\b(?:\s*points?)?{_POST}"
+)
+# "level 4 or lower", "ATK >= 2500", "attack over 3000", "DEF of 2000"
+_STAT_FIRST = re.compile(
+    rf"\b{_STAT}(?:\s*points?)?\s*(?:of|is|:)?\s*{_PRE}{_NUM}{_POST}"
+)
+
+_ATTRIBUTES = ['DARK', 'LIGHT', 'EARTH', 'WATER', 'FIRE', 'WIND', 'DIVINE']
+
+# Plural/alias spelling -> race value used by the card database
+_RACES = {
+    'beast-warrior': 'Beast-Warrior', 'beast warrior': 'Beast-Warrior',
+    'winged beast': 'Winged Beast', 'sea serpent': 'Sea Serpent',
+    'divine-beast': 'Divine-Beast', 'creator-god': 'Creator-God',
+    'aqua': 'Aqua', 'beast': 'Beast', 'cyberse': 'Cyberse', 'dinosaur': 'Dinosaur',
+    'dragon': 'Dragon', 'fairy': 'Fairy', 'fairies': 'Fairy', 'fiend': 'Fiend', 'fish': 'Fish',
+    'illusion': 'Illusion', 'insect': 'Insect', 'machine': 'Machine', 'plant': 'Plant',
+    'psychic': 'Psychic', 'pyro': 'Pyro', 'reptile': 'Reptile', 'rock': 'Rock',
+    'spellcaster': 'Spellcaster', 'thunder': 'Thunder', 'warrior': 'Warrior',
+    'wyrm': 'Wyrm', 'zombie': 'Zombie',
+}
+
+_RACE_PATTERN = re.compile(rf"\b(?P<race>{_alternation(_RACES)})s?\b")
+_ATTRIBUTE_PATTERN = re.compile(rf"\b(?P<attribute>{_alternation(_ATTRIBUTES)})\b", re.IGNORECASE)
+
+_FRAME_FLAGS = {
+    'fusion': 'is_fusion', 'synchro': 'is_synchro', 'xyz': 'is_xyz', 'ritual': 'is_ritual',
+    'pendulum': 'is_pendulum', 'tuner': 'is_tuner',
+}
+# Card kinds a query can ask for; spells and traps are kinds as much as the monster frames are
+_KIND_FLAGS = {'spell': 'is_spell', 'trap': 'is_trap', **_FRAME_FLAGS}
+_KIND = rf"(?:{_alternation(_KIND_FLAGS)})s?"
+# A run of kind words and the noun it qualifies: "trap cards", "Synchro Tuner monsters", "spell/trap cards"
+_KIND_PHRASE = re.compile(rf"\b{_KIND}(?:\s*(?:,|/|\band\b|\bor\b)?\s*{_KIND})*\b(?P<head>[\s-]*(?:cards?|monsters?|type)\b)?")
+_KIND_WORD = re.compile(rf"\b(?P<kind>{_alternation(_KIND_FLAGS)})(?P<plural>s?)\b")
+_KIND_LIST_SEPARATOR = re.compile(r",|/|\band\b|\bor\b")
+# Where the cards asked for end and the description of what they do starts:
+# "cards that negate trap cards", "monsters that cannot be destroyed by spell effects"
+_CLAUSE_PATTERN = re.compile(r"\b(?:that|which|who|whose|can|cannot|by|when|if|to|against|from|for|with)\b")
+
+# A race word is a category (not part of a name like "Winged Dragon of Ra") when plural,
+# followed by "monster"/"-type"/"card", or preceded by an attribute ("dark dragon")
+_RACE_CATEGORY_FOLLOWERS = ('monster', '-type', 'type', 'card')
+_PREVIOUS_WORD = re.compile(r"([\w-]+)\W*$")
+# Stat words glued to a digit ("LV3", "Link2") right after a capitalized word are part of a card name
+_NAME_STATS = {'lv', 'lvl', 'link'}
+
+_HIGHEST_PATTERN = re.compile(
+    r"\b(?:high(?:est)?|strong(?:est)?|powerful|biggest|most|top)\b[\w\s-]{0,30}?\b(?P<stat>atk|attack|def|defense|defence)\b"
+)
+
+
+def _previous_word(text: str, position: int) -> str:
+    previous = _PREVIOUS_WORD.search(text[:position])
+    return previous.group(1) if previous else ''
+
+
+def _is_name_stat(query: str, match) -> bool:
+    """True for "LV3" in "Armed Dragon LV3": a level/link written into a card name, not a constraint"""
+    if match.group('stat') not in _NAME_STATS or not query[match.end('stat'):match.end('stat') + 1].isdigit():
+        return False
+    previous = _previous_word(query, match.start('stat'))
+    return previous[:1].isupper() and previous.upper() not in _ATTRIBUTES
+
+
+def _is_race_category(query: str, match, stat_spans) -> bool:
+    """True when the race word reads as a category rather than as part of a card name"""
+    if match.group(0) != match.group('race') or match.group('race') == 'fairies':
+        return True
+    if query[match.end():].lstrip().lower().startswith(_RACE_CATEGORY_FOLLOWERS):
+        return True
+    if _previous_word(query, match.start()).upper() in _ATTRIBUTES:
+        return True
+    # Next to a stat phrase, e.g. "2500 ATK Dragon", "Level 4 Warrior", "Dragon level 8"
+    return any(
+        not query[end:match.start()].strip() if end <= match.start() else not query[match.end():start].strip()
+        for start, end in stat_spans
+    )
+
+
+def _kind_flags(query: str) -> list:
+    """Flags for the card kinds the query asks for, e.g. "trap cards" or "Fusion monsters".
+
+    Only kind words heading what is asked for count: "Fusion summoning support cards", "destroyed by
+    spell effects" or "cards that negate trap cards" describe the cards without restricting their kind.
+    """
+    text = query.lower()
+    clause = _CLAUSE_PATTERN.search(text)
+    if clause:
+        text = text[:clause.start()]
+
+    flags = []
+    for phrase in _KIND_PHRASE.finditer(text):
+        words = list(_KIND_WORD.finditer(phrase.group(0)))
+        if not (phrase.group('head') or words[-1].group('plural')):
+            continue
+        if _KIND_LIST_SEPARATOR.search(phrase.group(0)):
+            # "spell and trap cards" wants either kind, which a mask of required flags cannot express
+            continue
+        for word in words:
+            flag = _KIND_FLAGS[word.group('kind')]
+            if flag not in flags:
+                flags.append(flag)
+    return flags
+
+
+def parse_stat_query(query: str) -> StatQuery:
+    """Turn phrases like '2500 ATK or higher, level 4 or lower, LIGHT' into a StatQuery"""
+    stat_query = StatQuery()
+    text = query.lower()
+    stat_spans = []
+
+    for pattern in (_NUMBER_FIRST, _STAT_FIRST):
+        for match in pattern.finditer(text):
+            if _is_name_stat(query, match):
+                continue
+            stat_spans.append(match.span())
+            field = _STAT_WORDS[match.group('stat')]
+            value = int(match.group('num').replace(',', ''))
+            suffix = match.groupdict().get('mid') or match.group('post')
+            if match.group('pre'):
+                op = _PREFIX_OPS[match.group('pre')]
+            elif suffix:
+                op = _SUFFIX_OPS[suffix]
+            else:
+                op = '=='
+            stat_query.numeric.append((field, op, value))
+        # Blank out what we consumed so the second pattern does not re-read it
+        text = pattern.sub(lambda m: ' ' * len(m.group(0)), text)
+
+    stat_query.flags = _kind_flags(query)
+
+    highest = _HIGHEST_PATTERN.search(query.lower())
+    if highest and not stat_query.numeric and not {'is_spell', 'is_trap'} & set(stat_query.flags):
+        # "highest ATK dragons" has no threshold but is still an exact, sortable stat query
+        stat_query.numeric.append((_STAT_WORDS[highest.group('stat')], '>', 0))
+        stat_spans.append(highest.span())
+
+    for field, _, _ in stat_query.numeric:
+        if field in ('atk', 'def'):
+            stat_query.sort_field = field
+            break
+
+    for match in _ATTRIBUTE_PATTERN.finditer(query):
+        word = match.group('attribute')
+        following = query[match.end():match.end() + 12].lower()
+        # Accept "LIGHT", "light attribute" or "dark dragon(s)"; skip names like "Dark Magician"
+        if word.isupper() or following.lstrip().startswith(('attribute', 'monster')) \
+                or _RACE_PATTERN.match(following.lstrip()):
+            stat_query.categories['attribute'] = word.upper()
+            break
+
+    for race in _RACE_PATTERN.finditer(query.lower()):
+        if _is_race_category(query, race, stat_spans):
+            stat_query.categories['race'] = _RACES[race.group('race')]
+            break
+
+    return stat_query
@@ -0,0 +1,103 @@
+import math
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token for English card text), no tokenizer needed"""
+    return math.ceil(len(text) / 4)
+
+
+def compact_card(card: dict) -> str:
+    """One canonical line per card: name, then a bracket of the stats that apply, then the effect"""
+    details = [card['type']]
+    race = card.get('race') or ''
+    if race in card['type']:
+        # Spells/Traps carry their kind as race ("Normal Spell" / "Normal"), it adds nothing
+        race = ''
+    if card.get('attribute') or race:
+        details.append(' '.join(value for value in (card.get('attribute'), race) if value))
+    if card.get('is_monster'):
+        if card.get('level'):
+            details.append(f"Level {card['level']}")
+        elif card.get('rank'):
+            details.append(f"Rank {card['rank']}")
+        elif card.get('linkval'):
+            details.append(f"Link {card['linkval']}")
+        # Link monsters have no DEF
+        details.append(f"ATK {card['atk']}" if card.get('linkval') else f"ATK {card['atk']} DEF {card['def']}")
+    if card.get('archetype'):
+        details.append(f"Archetype {card['archetype']}")
+
+    line = f"{card['name']} [{'; '.join(details)}]"
+    desc = (card.get('desc') or '').replace('""', '"')
+    return f"{line}: {desc}" if desc else line
+
+
+class ContextBuilder:
+    """Renders retrieved cards compactly from their structured fields and packs them into a token budget"""
+
+    def __init__(self, card_table=None, token_budget: int = 1500):
+        self.card_table = card_table
+        self.token_budget = token_budget
+        self._rows_by_id = None
+
+    def _row(self, doc):
+        if self.card_table is None:
+            return None
+        if self._rows_by_id is None:
+            self._rows_by_id = {card_id: row for row, card_id in enumerate(self.card_table.text['id'])}
+        card_id = doc.metadata.get("card_id") or doc.metadata.get("id")
+        return self._rows_by_id.get(str(card_id)) if card_id else None
+
+    def render(self, doc) -> str:
+        """Compact text for one document; documents without a card table row keep their content"""
+        row = self._row(doc)
+        if row is None:
+            return doc.page_content.strip()
+
+        text = compact_card(self.card_table.record(row))
+        # Relation lines from the card graph say why the card is in the context, keep them
+        if doc.page_content.startswith("Relation: "):
+            relation = doc.page_content.split("\n", 1)[0][len("Relation: "):]
+            text = f"({relation}) {text}"
+        return text
+
+    def build(self, docs):
+        """Return (context, stats): deduplicated cards in retrieval order, up to the token budget"""
+        seen = set()
+        parts = []
+        tokens = 0
+        dropped = 0
+        original_tokens = estimate_tokens("\n\n".join(doc.page_content for doc in docs))
+
+        for doc in docs:
+            row = self._row(doc)
+            key = row if row is not None else doc.page_content
+            if key in seen:
+                continue
+            seen.add(key)
+
+            text = self.render(doc)
+            cost = estimate_tokens(text) + 1
+            if tokens + cost > self.token_budget:
+                if parts:
+                    # Keep going, a shorter card further down may still fit
+                    dropped += 1
+                    continue
+                # Never send an empty context because the top card alone is too long
+                text = text[:self.token_budget * 4]
+                cost = estimate_tokens(text) + 1
+            parts.append(text)
+            tokens += cost
+
+        context = "\n".join(parts)
+        stats = {
+            "cards": len(parts),
+            "dropped": dropped,
+            "tokens": estimate_tokens(context),
+            "original_tokens": original_tokens,
+        }
+        stats["tokens_saved"] = stats["original_tokens"] - stats["tokens"]
+        return context, stats
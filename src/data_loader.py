@@ -1,7 +1,44 @@
+import re
 import pandas as pd
 import numpy as np
+from src.card_table import CardTable, NUMERIC_FIELDS
+from src.card_store import CardStore, is_card_store, write_dataframe
+
+# Structured fields carried into the vector index as document metadata
+CARD_METADATA_COLUMNS = ['id', 'name', 'type', 'attribute', 'race', 'archetype', 'atk', 'def', 'level', 'rank', 'linkval']
+
+# Typed columns of the processed card store handed to the vector store build
+# (desc feeds the optional per-field vectors, it is not stored as metadata)
+PROCESSED_SCHEMA = {
+    column: 'int32' if column in NUMERIC_FIELDS else 'str'
+    for column in CARD_METADATA_COLUMNS + ['desc', 'combined_info']
+}
+
+MONSTER_KEYWORDS = ['Monster', 'Fusion', 'Synchro', 'Xyz', 'Link', 'Pendulum', 'Ritual', 'Spirit', 'Toon', 'Union']
+
+# Cards mentioned in a card's description (in doubled quotes)
+MENTION_PATTERN = re.compile(r'""([^"]+)""')
+
+RELATIONSHIP_KEYWORDS = [
+    ('support', 'supports'),
+    ('synergy', 'synergy'),
+    ('combo', 'combo'),
+    ('archetype', 'archetype'),
+    ('series', 'series'),
+    ('summon', 'summons'),
+    ('special summon', 'special summons')
+]
+
+# (minimum ATK, search phrase), checked from the top
+ATK_BUCKETS = [
+    (4000, "4000+ ATK High Power Monster"),
+    (3000, "3000+ ATK High Power Monster"),
+    (2500, "2500+ ATK Strong Monster"),
+    (2000, "2000+ ATK Moderate Power Monster"),
+]
 
 class YuGiOhDataLoader:
+    # Either path may be a CSV file or a card store directory
     def __init__(self, original_csv: str, processed_csv: str):
         self.original_csv = original_csv
         self.processed_csv = processed_csv
@@ -31,8 +68,7 @@ class YuGiOhDataLoader:
 
     def is_monster_card(self, card_type: str) -> bool:
         """Check if a card is a monster type"""
-        monster_keywords = ['Monster', 'Fusion', 'Synchro', 'Xyz', 'Link', 'Pendulum', 'Ritual', 'Spirit', 'Toon', 'Union']
-        return any(keyword in card_type for keyword in monster_keywords)
+        return any(keyword in card_type for keyword in MONSTER_KEYWORDS)
 
     def create_combined_info(self, row: pd.Series) -> str:
         """Create combined information string for semantic search with name emphasis"""
@@ -71,14 +107,10 @@ class YuGiOhDataLoader:
                 info_parts.append(f"{name} ATK: {int(atk)}")
                 info_parts.append(f"ATK {int(atk)}")
                 # Add ATK range indicators for search
-                if int(atk) >= 4000:
-                    info_parts.append(f"4000+ ATK High Power Monster")
-                elif int(atk) >= 3000:
-                    info_parts.append(f"3000+ ATK High Power Monster")
-                elif int(atk) >= 2500:
-                    info_parts.append(f"2500+ ATK Strong Monster")
-                elif int(atk) >= 2000:
-                    info_parts.append(f"2000+ ATK Moderate Power Monster")
+                for minimum, phrase in ATK_BUCKETS:
+                    if int(atk) >= minimum:
+                        info_parts.append(phrase)
+                        break
             if def_:
                 info_parts.append(f"{name} DEF: {int(def_)}")
                 info_parts.append(f"DEF {int(def_)}")
@@ -106,8 +138,7 @@ class YuGiOhDataLoader:
             desc_lower = desc.lower()
 
             # Find cards mentioned in this card's description (in quotes)
-            import re
-            mentioned_cards = re.findall(r'""([^"]+)""', desc)
+            mentioned_cards = MENTION_PATTERN.findall(desc)
             for mentioned_card in mentioned_cards:
                 mentioned_card_clean = mentioned_card.strip()
                 if mentioned_card_clean and mentioned_card_clean != name:
@@ -116,17 +147,7 @@ class YuGiOhDataLoader:
                     info_parts.append(f"synergy with {mentioned_card_clean}")
 
             # Look for common relationship keywords
-            relationship_keywords = [
-                ('support', 'supports'),
-                ('synergy', 'synergy'),
-                ('combo', 'combo'),
-                ('archetype', 'archetype'),
-                ('series', 'series'),
-                ('summon', 'summons'),
-                ('special summon', 'special summons')
-            ]
-
-            for keyword, action in relationship_keywords:
+            for keyword, action in RELATIONSHIP_KEYWORDS:
                 if keyword in desc_lower:
                     info_parts.append(f"{action} other cards")
                     info_parts.append(f"card relationship")
@@ -137,31 +158,162 @@ class YuGiOhDataLoader:
 
         return ' '.join(info_parts)
 
-    def load_and_process(self):
-        """Load Yu-Gi-Oh! card data and create processed search content"""
+    def build_combined_info(self, df: pd.DataFrame) -> pd.Series:
+        """Columnar equivalent of create_combined_info for a whole cleaned DataFrame (identical output)"""
+        def text(field):
+            return df[field].where(df[field].notna(), '').to_numpy(dtype=object)
+
+        def optional(condition, values):
+            # Every part after the first is prefixed with the ' ' that ' '.join would insert
+            return np.where(condition, values, '').astype(object)
+
+        def contains(values, needle):
+            # Plain substring test; cheaper than .str.contains on object columns
+            return np.fromiter((needle in value for value in values), dtype=bool, count=len(values))
+
+        def stat(field):
+            values = df[field].to_numpy(dtype=float)
+            present = ~np.isnan(values) & (values != 0)
+            as_int = np.where(present, values, 0).astype(np.int64)
+            return present, as_int, as_int.astype(str).astype(object)
+
+        name = text('name')
+        card_type = text('type')
+        desc = text('desc')
+        race = text('race')
+        attribute = text('attribute')
+        archetype = text('archetype')
+
+        # Only a few dozen distinct card types exist, so test each distinct value once
+        type_codes, type_values = pd.factorize(card_type)
+        def type_contains(needle):
+            return np.array([needle in value for value in type_values] + [False], dtype=bool)[type_codes]
+
+        is_monster = np.zeros(len(df), dtype=bool)
+        for keyword in MONSTER_KEYWORDS:
+            is_monster |= type_contains(keyword)
+        has_desc = desc != ''
+
+        # Columns of parts, joined once per row at the end (repeated "+" would re-copy the growing string)
+        parts = [
+            "Card Name: " + name,
+            " " + name,
+            " Card Type: " + card_type,
+            optional(race != '', " Race: " + race),
+            optional(attribute != '', " Attribute: " + attribute),
+        ]
+
+        atk_present, atk_int, atk_text = stat('atk')
+        def_present, _, def_text = stat('def')
+        level_present, _, level_text = stat('level')
+        rank_present, _, rank_text = stat('rank')
+        link_present, _, link_text = stat('linkval')
+
+        atk_present &= is_monster
+        def_present &= is_monster
+        parts.append(optional(atk_present, " " + name + " ATK: " + atk_text + " ATK " + atk_text))
+        parts.append(np.select(
+            [atk_present & (atk_int >= minimum) for minimum, _ in ATK_BUCKETS],
+            [" " + phrase for _, phrase in ATK_BUCKETS],
+            default=''
+        ).astype(object))
+        parts.append(optional(def_present, " " + name + " DEF: " + def_text + " DEF " + def_text))
+        parts.append(np.select(
+            [is_monster & level_present, is_monster & rank_present, is_monster & link_present],
+            [" Level: " + level_text, " Rank: " + rank_text, " Link: " + link_text],
+            default=''
+        ).astype(object))
+
+        parts.append(optional(archetype != '', " Archetype: " + archetype))
+        parts.append(optional(has_desc, " Effect: ").astype(object))
+        parts.append(desc)
+
+        is_fusion_text = type_contains('Fusion Monster') & (contains(desc, ' + ') | contains(desc, '+"')) & has_desc
+        parts.append(optional(is_fusion_text, " Fusion Materials: " + desc + " Fusion Material: " + name))
+
+        parts.append([
+            ''.join(
+                f" mentions {card} supports {card} synergy with {card}"
+                for card in (found.strip() for found in MENTION_PATTERN.findall(card_desc))
+                if card and card != card_name
+            ) if '""' in card_desc else ''
+            for card_desc, card_name in zip(desc, name)
+        ])
+
+        desc_lower = [card_desc.lower() for card_desc in desc]
+        for keyword, action in RELATIONSHIP_KEYWORDS:
+            has_keyword = contains(desc_lower, keyword) & has_desc
+            parts.append(optional(has_keyword, f" {action} other cards card relationship"))
+
+        parts.append(" Search for " + name)
+        parts.append(" Find " + name)
+
+        combined = [''.join(row) for row in zip(*parts)]
+        return pd.Series(combined, index=df.index, dtype=object)
+
+    def load_clean_cards(self) -> pd.DataFrame:
+        """Load the raw Yu-Gi-Oh! cards (card store or CSV) and return the cleaned card DataFrame"""
         try:
-            # Load the Yu-Gi-Oh! CSV
-            df = pd.read_csv(self.original_csv, encoding='utf-8')
+            if is_card_store(self.original_csv):
+                df = CardStore(self.original_csv).to_dataframe()
+            else:
+                # Load the Yu-Gi-Oh! CSV
+                df = pd.read_csv(self.original_csv, encoding='utf-8')
         except Exception as e:
-            raise ValueError(f"Error loading CSV file {self.original_csv}: {e}")
+            raise ValueError(f"Error loading card data {self.original_csv}: {e}")
+
+        self._check_columns(df.columns)
 
+        # Clean the data
+        return self.clean_card_data(df)
+
+    def iter_clean_chunks(self, batch_size: int):
+        """Yield the raw cards as cleaned DataFrames of at most batch_size rows"""
+        if is_card_store(self.original_csv):
+            store = CardStore(self.original_csv)
+            self._check_columns(store.columns)
+            chunks = store.iter_dataframes(batch_size)
+        else:
+            chunks = pd.read_csv(self.original_csv, encoding='utf-8', chunksize=batch_size)
+
+        for chunk in chunks:
+            self._check_columns(chunk.columns)
+            yield self.clean_card_data(chunk)
+
+    def _check_columns(self, columns):
         # Check for required columns
         required_cols = {'name', 'type', 'desc'}
-        missing = required_cols - set(df.columns)
+        missing = required_cols - set(columns)
         if missing:
-            raise ValueError(f"Missing required columns in Yu-Gi-Oh! CSV: {missing}")
+            raise ValueError(f"Missing required columns in Yu-Gi-Oh! card data: {missing}")
 
-        # Clean the data
-        df = self.clean_card_data(df)
+    def build_card_table(self, card_table_path: str, df: pd.DataFrame = None) -> str:
+        """Save the columnar stat table used for exact ATK/DEF/Level filtering"""
+        if df is None:
+            df = self.load_clean_cards()
+
+        CardTable.from_dataframe(df).save(card_table_path)
+
+        print(f"Saved card table with {len(df)} cards to {card_table_path}")
+        return card_table_path
+
+    def load_and_process(self, df: pd.DataFrame = None):
+        """Load Yu-Gi-Oh! card data and create processed search content (df: already cleaned cards to reuse)"""
+        if df is None:
+            df = self.load_clean_cards()
 
-        # Create combined_info for semantic search
-        df['combined_info'] = df.apply(self.create_combined_info, axis=1)
+        # Create combined_info for semantic search, without touching a frame the caller still uses
+        df = df.assign(combined_info=self.build_combined_info(df))
 
         # Remove rows with empty combined_info
         df = df[df['combined_info'].str.len() > 20]  # Basic length filter
 
-        # Save only the combined_info column for the vector store
-        df[['combined_info']].to_csv(self.processed_csv, index=False, encoding='utf-8')
+        # Save the structured card fields (index metadata) alongside combined_info for the vector store
+        columns = [column for column in CARD_METADATA_COLUMNS if column in df.columns] + ['desc', 'combined_info']
+        if is_card_store(self.processed_csv):
+            write_dataframe(df, self.processed_csv, {column: PROCESSED_SCHEMA[column] for column in columns})
+        else:
+            df[columns].to_csv(self.processed_csv, index=False, encoding='utf-8')
 
         print(f"Processed {len(df)} Yu-Gi-Oh! cards")
         print(f"Sample combined_info: {df.iloc[0]['combined_info'][:200]}...")
@@ -0,0 +1,125 @@
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+from utils import metrics
+
+
+def normalize_text(text: str) -> str:
+    """Cache key normalization: collapse whitespace so trivially different strings share an entry"""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper with a bounded in-memory LRU and an optional SQLite tier on disk"""
+
+    def __init__(self, embedding: Embeddings, max_size: int = 4096, cache_path: str = None):
+        self.embedding = embedding
+        self.max_size = max_size
+        self.cache_path = cache_path
+        self.namespace = getattr(embedding, "model_name", type(embedding).__name__)
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(cache_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    def _key(self, text: str) -> str:
+        return f"{self.namespace}\x00{normalize_text(text)}"
+
+    def _get(self, key: str):
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                metrics.CACHE_REQUESTS.inc(cache="embedding", result="hit")
+                return vector
+
+            if self._db is not None:
+                row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    vector = array('f', row[0]).tolist()
+                    self._remember(key, vector)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    metrics.CACHE_REQUESTS.inc(cache="embedding", result="disk_hit")
+                    return vector
+
+            self.misses += 1
+            metrics.CACHE_REQUESTS.inc(cache="embedding", result="miss")
+            return None
+
+    def _remember(self, key: str, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def _put_many(self, items):
+        with self._lock:
+            for key, vector in items:
+                self._remember(key, vector)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, array('f', vector).tobytes()) for key, vector in items]
+                )
+                self._db.commit()
+
+    def embed_documents(self, texts):
+        keys = [self._key(text) for text in texts]
+        vectors = [self._get(key) for key in keys]
+
+        # Embed each distinct missing string once, in a single batch
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None and key not in missing:
+                missing[key] = text
+
+        if missing:
+            computed = self.embedding.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), computed))
+            self._put_many(list(fresh.items()))
+            vectors = [vector if vector is not None else fresh[key] for key, vector in zip(keys, vectors)]
+
+        return vectors
+
+    def embed_query(self, text: str):
+        key = self._key(text)
+        vector = self._get(key)
+        if vector is None:
+            vector = self.embedding.embed_query(text)
+            self._put_many([(key, vector)])
+        return vector
+
+    def stats(self) -> dict:
+        """Hit/miss counters for the cache"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._memory),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
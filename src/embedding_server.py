@@ -0,0 +1,262 @@
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from utils.logger import get_logger
+from utils import metrics
+
+logger = get_logger(__name__)
+
+# Frame: 4-byte big-endian header length, JSON header, then header["nbytes"] bytes of payload.
+# Requests carry texts in the header; responses carry float32 vectors as the payload.
+_LENGTH = struct.Struct("!I")
+
+EMBED_BATCH_TEXTS = metrics.REGISTRY.histogram(
+    "yugioh_embedding_server_batch_texts", "Texts per forward pass of the shared embedding server",
+    buckets=metrics.SIZE_BUCKETS)
+
+
+def _encode_frame(header: dict, payload: bytes = b"") -> bytes:
+    header = dict(header, nbytes=len(payload))
+    data = json.dumps(header).encode("utf-8")
+    return _LENGTH.pack(len(data)) + data + payload
+
+
+async def _read_frame_body(reader, size: int):
+    header = json.loads(await reader.readexactly(size))
+    payload = await reader.readexactly(header["nbytes"]) if header.get("nbytes") else b""
+    return header, payload
+
+
+class MicroBatcher:
+    """Collects concurrent embedding requests for up to max_wait seconds and runs them as one forward pass"""
+
+    def __init__(self, embed_fn, max_batch_size: int = 64, max_wait: float = 0.005):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        # Requests from their first byte until their vectors are ready; idle connections do not count
+        self.in_flight = 0
+        self._queue = None
+
+    async def submit(self, texts):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        # One model, one forward pass at a time; the event loop keeps accepting requests meanwhile
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            # Only wait while requests already on their way are missing from the batch
+            while size < self.max_batch_size and len(batch) < self.in_flight:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                with metrics.stage("embedding_server_batch"):
+                    vectors = await loop.run_in_executor(executor, self.embed_fn, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.requests += len(batch)
+            self.batches += 1
+            self.texts += len(texts)
+            EMBED_BATCH_TEXTS.observe(len(texts))
+
+            start = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[start:start + len(item_texts)])
+                start += len(item_texts)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "texts_per_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+class EmbeddingServer:
+    """Serves one embedding model to every process on the node over a Unix socket"""
+
+    def __init__(self, embedding: Embeddings, socket_path: str, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.embedding = embedding
+        self.socket_path = socket_path
+        self.model_name = getattr(embedding, "model_name", type(embedding).__name__)
+        self.batcher = MicroBatcher(embedding.embed_documents, max_batch_size, max_wait_ms / 1000)
+
+    async def respond(self, header: dict) -> bytes:
+        op = header.get("op", "embed")
+        if op == "embed":
+            try:
+                vectors = await self.batcher.submit(list(header.get("texts", [])))
+                array = np.asarray(vectors, dtype=np.float32)
+                return _encode_frame({"rows": len(vectors), "dim": array.shape[1] if array.ndim == 2 else 0},
+                                     array.tobytes())
+            except Exception as e:
+                logger.error(f"Embedding request failed {str(e)}")
+                return _encode_frame({"error": str(e)})
+        if op == "info":
+            return _encode_frame({"model_name": self.model_name, **self.batcher.stats()})
+        return _encode_frame({"error": f"Unknown op {op!r}"})
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    size = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))[0]
+                except asyncio.IncompleteReadError:
+                    break
+
+                # In flight from the length prefix on, so a batch can wait for a request still being read
+                self.batcher.in_flight += 1
+                try:
+                    header, _ = await _read_frame_body(reader, size)
+                    response = await self.respond(header)
+                except asyncio.IncompleteReadError:
+                    break
+                finally:
+                    self.batcher.in_flight -= 1
+
+                writer.write(response)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self):
+        if os.path.exists(self.socket_path):
+            # A socket left behind by a previous server; connecting to it would fail anyway
+            os.remove(self.socket_path)
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+
+        batcher = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_unix_server(self.handle, path=self.socket_path)
+        logger.info(f"Embedding server for {self.model_name} listening on {self.socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+class EmbeddingClient(Embeddings):
+    """Drop-in Embeddings that sends texts to a shared EmbeddingServer instead of loading the model.
+
+    Each thread keeps its own connection, so concurrent callers land in the same server batch.
+    """
+
+    def __init__(self, socket_path: str, model_name: str = None, timeout: float = 60.0, max_texts_per_request: int = 256):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.max_texts_per_request = max_texts_per_request
+        self._local = threading.local()
+        # Same cache namespace as the in-process model, so cached query vectors stay valid
+        self.model_name = model_name or self.info()["model_name"]
+
+    def _connection(self) -> socket.socket:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            try:
+                conn.connect(self.socket_path)
+            except OSError:
+                conn.close()
+                raise
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close this thread's connection; the next call reconnects"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _recv_exactly(self, conn, size: int) -> bytes:
+        chunks = []
+        while size:
+            chunk = conn.recv(min(size, 1 << 20))
+            if not chunk:
+                raise ConnectionError("Embedding server closed the connection")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def _request(self, header: dict):
+        # One retry on a fresh connection covers a server restart between calls
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.sendall(_encode_frame(header))
+                size = _LENGTH.unpack(self._recv_exactly(conn, _LENGTH.size))[0]
+                response = json.loads(self._recv_exactly(conn, size))
+                payload = self._recv_exactly(conn, response["nbytes"]) if response.get("nbytes") else b""
+                break
+            except (ConnectionError, OSError):
+                self.close()
+                if attempt:
+                    raise
+        if "error" in response:
+            raise RuntimeError(f"Embedding server error: {response['error']}")
+        return response, payload
+
+    def info(self) -> dict:
+        header, _ = self._request({"op": "info"})
+        return {key: value for key, value in header.items() if key != "nbytes"}
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        vectors = []
+        for start in range(0, len(texts), self.max_texts_per_request):
+            header, payload = self._request({"op": "embed", "texts": texts[start:start + self.max_texts_per_request]})
+            if header["rows"]:
+                vectors.extend(np.frombuffer(payload, dtype=np.float32).reshape(header["rows"], header["dim"]).tolist())
+        return vectors
+
+    def embed_query(self, text: str):
+        return self.embed_documents([text])[0]
+
+
+def wait_for_server(socket_path: str, timeout: float = 60.0) -> bool:
+    """Poll until an embedding server answers on socket_path (e.g. a sidecar still loading its model)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            # The probe's connection is closed right away instead of lingering until GC
+            EmbeddingClient(socket_path, timeout=5.0).close()
+            return True
+        except (OSError, RuntimeError):
+            time.sleep(0.2)
+    return False
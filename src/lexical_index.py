@@ -0,0 +1,104 @@
+import json
+import re
+import numpy as np
+from src.card_table import CATEGORY_FIELDS
+
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+")
+
+# Words that match half the card pool and only dilute the ranking
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'card', 'cards', 'for', 'from', 'if', 'in',
+    'is', 'it', 'its', 'me', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'what', 'which', 'with', 'you', 'your',
+}
+
+# Name tokens count this many times, a card's own name is the strongest lexical signal
+NAME_WEIGHT = 3
+
+
+def tokenize(text: str):
+    return [token for token in TOKEN_PATTERN.findall(str(text).lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """In-process BM25 inverted index over card text (name, type, race, attribute, archetype, effect)"""
+
+    def __init__(self, doc_lengths, postings: dict, k1: float = 1.2, b: float = 0.75):
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self.k1 = k1
+        self.b = b
+        # term -> (rows, term frequencies) as arrays, so scoring a term is one vectorized update
+        self.postings = {
+            term: (np.asarray([row for row, _ in entries], dtype=np.int32),
+                   np.asarray([tf for _, tf in entries], dtype=np.float32))
+            for term, entries in postings.items()
+        }
+        count = len(self.doc_lengths)
+        self.average_length = float(self.doc_lengths.mean()) if count else 0.0
+        self.idf = {
+            term: float(np.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5)))
+            for term, (rows, _) in self.postings.items()
+        }
+
+    @classmethod
+    def from_card_table(cls, card_table) -> "BM25Index":
+        doc_lengths = []
+        postings = {}
+        for row in range(len(card_table)):
+            card = card_table.record(row)
+            counts = {}
+            for token in tokenize(card['name']):
+                counts[token] = counts.get(token, 0) + NAME_WEIGHT
+            text = ' '.join([card['type'], card['desc']] + [card[field] for field in CATEGORY_FIELDS])
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+
+            doc_lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append([row, tf])
+        return cls(doc_lengths, postings)
+
+    def save(self, path: str):
+        postings = {
+            term: [[int(row), int(tf)] for row, tf in zip(rows, tfs)]
+            for term, (rows, tfs) in self.postings.items()
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"doc_lengths": self.doc_lengths.astype(int).tolist(), "postings": postings}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data["doc_lengths"], data["postings"])
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def search(self, query: str, limit: int = 10):
+        """Return (row, score) pairs for the best matching cards, highest score first"""
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term in self.postings]
+        if not terms:
+            return []
+
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / (self.average_length or 1.0))
+        for term in terms:
+            rows, tfs = self.postings[term]
+            scores[rows] += self.idf[term] * tfs * (self.k1 + 1) / (tfs + norm[rows])
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(int(row), float(scores[row])) for row in candidates]
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60, limit: int = None):
+    """Fuse ranked key lists: each key scores sum(1 / (k + rank)) over the lists it appears in"""
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    # Ties keep first-seen order, so earlier lists win
+    fused = sorted(scores, key=scores.get, reverse=True)
+    return fused[:limit] if limit is not None else fused
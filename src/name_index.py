@@ -0,0 +1,126 @@
+import heapq
+import json
+import re
+from collections import Counter
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase and strip punctuation so 'Blue-Eyes White Dragon' == 'blue eyes white dragon'"""
+    name = re.sub(r'[^0-9a-z]+', ' ', str(name).lower())
+    return name.strip()
+
+
+def _trigrams(text: str):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """Plain Levenshtein distance with a single rolling row"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        previous = current
+    return previous[-1]
+
+
+class CardNameIndex:
+    """Exact hash lookup plus trigram/edit-distance fuzzy lookup from card name to card table row"""
+
+    def __init__(self, names, rows, postings: dict = None):
+        self.names = list(names)  # normalized names
+        self.rows = list(rows)  # card table row for each name
+        self.exact = {}
+        for position, name in enumerate(self.names):
+            self.exact.setdefault(name, position)
+
+        if postings is None:
+            postings = {}
+            for position, name in enumerate(self.names):
+                for gram in _trigrams(name):
+                    postings.setdefault(gram, []).append(position)
+        self.postings = postings
+        self.gram_counts = [len(_trigrams(name)) for name in self.names]
+        self.max_words = max((len(name.split()) for name in self.names), default=0)
+
+    @classmethod
+    def from_card_table(cls, card_table) -> "CardNameIndex":
+        names = [normalize_name(name) for name in card_table.text['name']]
+        return cls(names, range(len(names)))
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"names": self.names, "rows": self.rows, "postings": self.postings}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "CardNameIndex":
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data["names"], data["rows"], data["postings"])
+
+    def __len__(self):
+        return len(self.names)
+
+    def lookup(self, text: str, min_score: float = 0.85, candidates: int = 10, min_dice: float = 0.5):
+        """Return (row, score, normalized name) for the best match above min_score, or None"""
+        query = normalize_name(text)
+        if len(query) < 3:
+            return None
+
+        position = self.exact.get(query)
+        if position is not None:
+            return self.rows[position], 1.0, self.names[position]
+
+        # Rank names by shared trigrams (Dice coefficient), then confirm with edit distance
+        grams = _trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            for position in self.postings.get(gram, ()):
+                shared[position] += 1
+        if not shared:
+            return None
+
+        dice = {p: 2 * count / (len(grams) + self.gram_counts[p]) for p, count in shared.items()}
+        shortlist = heapq.nlargest(candidates, dice, key=dice.get)
+
+        best = None
+        for position in shortlist:
+            name = self.names[position]
+            longest = max(len(query), len(name))
+            # Cheap bounds first: too few shared trigrams, or a length gap alone already fails
+            if dice[position] < min_dice or abs(len(query) - len(name)) / longest > 1 - min_score:
+                continue
+            score = 1 - _edit_distance(query, name) / longest
+            if best is None or score > best[1]:
+                best = (self.rows[position], score, name)
+
+        if best is not None and best[1] >= min_score:
+            return best
+        return None
+
+    def find_names(self, text: str, min_words: int = 2):
+        """Card names spelled out inside the text, as (row, start, end) character spans, longest first.
+
+        Single words are skipped by default: too many one-word card names are ordinary words.
+        """
+        tokens = list(re.finditer(r'[0-9a-z]+', str(text).lower()))
+        found = []
+        taken = set()
+        for length in range(min(self.max_words, len(tokens)), min_words - 1, -1):
+            for first in range(len(tokens) - length + 1):
+                span = range(first, first + length)
+                if taken.intersection(span):
+                    continue
+                position = self.exact.get(' '.join(token.group() for token in tokens[first:first + length]))
+                if position is not None:
+                    found.append((self.rows[position], tokens[first].start(), tokens[first + length - 1].end()))
+                    taken.update(span)
+        return found
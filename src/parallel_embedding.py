@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from langchain_core.embeddings import Embeddings
+
+# One model per worker process, created by the pool initializer
+_worker_embedding = None
+
+
+def _init_worker(model_name: str, threads: int):
+    global _worker_embedding
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    import torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    # Split the cores between workers instead of every worker grabbing all of them
+    torch.set_num_threads(threads)
+    _worker_embedding = HuggingFaceEmbeddings(model_name=model_name)
+
+
+def _embed_shard(texts):
+    return _worker_embedding.embed_documents(texts)
+
+
+class ParallelEmbeddings(Embeddings):
+    """Shards embed_documents across a pool of worker processes, each with its own model"""
+
+    def __init__(self, model_name: str, workers: int = None, batch_size: int = 64):
+        self.model_name = model_name
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self._pool = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # spawn: torch and tokenizers are not fork-safe once initialised
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, threads)
+            )
+        return self._pool
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+
+        # map() keeps input order. The vectors match the in-process model only up to float rounding:
+        # padding per shard and the per-worker torch thread count change the summation order
+        shards = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        vectors = []
+        for shard_vectors in self._executor().map(_embed_shard, shards):
+            vectors.extend(shard_vectors)
+        return vectors
+
+    def embed_query(self, text: str):
+        return self.embed_documents([text])[0]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
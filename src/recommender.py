@@ -1,12 +1,65 @@
+import asyncio
+import contextvars
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from langchain_groq import ChatGroq
+from langchain_core.documents import Document
 from langchain_core.messages import HumanMessage, SystemMessage
 from src.prompt_template import get_yugioh_prompt
+from src.card_table import parse_stat_query
+from src.batch_retriever import metadata_filter
+from src.lexical_index import reciprocal_rank_fusion
+from src.context_builder import ContextBuilder, estimate_tokens
+from src.answer_cache import normalize_query
+from utils.logger import get_logger
+from utils import metrics
+
+logger = get_logger(__name__)
+
+RELATION_DESCRIPTIONS = {
+    'fusion_material': "fusion material of {target}",
+    'fusion_of': "Fusion Monster that uses {target} as material",
+    'mentions': "mentioned in the effect of {target}",
+    'mentioned_by': "mentions {target} in its effect",
+    'same_archetype': "same archetype as {target}",
+}
+
+# Power indicators and specific ATK values searched alongside every ATK query that falls back.
+# They never change, so a build can embed them into the on-disk query cache ahead of time.
+ATK_FALLBACK_PHRASINGS = [
+    "3000+ ATK High Power Monster",  # High ATK cards
+    "2500+ ATK Strong Monster",    # Strong ATK cards
+    "4000+ ATK High Power Monster", # Very high ATK cards
+    "2000+ ATK Moderate Power Monster", # Moderate ATK cards
+    "ATK 3000",  # Specific ATK values
+    "ATK 2500",
+    "ATK 4000",
+]
+
+def card_key(doc) -> str:
+    """Card identity of a retrieved document, whether it came from Chroma or the card table"""
+    return doc.metadata.get("card_id") or doc.metadata.get("id") or doc.page_content
 
 class YuGiOhRecommender:
-    def __init__(self,retriever,api_key:str,model_name:str):
-        self.llm = ChatGroq(api_key=api_key,model=model_name,temperature=0)
+    def __init__(self,retriever,api_key:str,model_name:str,card_table=None,stat_limit:int=15,answer_cache=None,name_index=None,name_min_score:float=0.88,card_graph=None,related_hops:int=1,related_limit:int=15,lexical_index=None,lexical_limit:int=10,fusion_k:int=60,context_builder=None,llm=None):
+        # Any LangChain chat model can be passed in (e.g. a fake streaming model for offline runs)
+        self.llm = llm or ChatGroq(api_key=api_key,model=model_name,temperature=0)
         self.retriever = retriever
         self.prompt = get_yugioh_prompt()
+        self.card_table = card_table
+        self.stat_limit = stat_limit
+        self.answer_cache = answer_cache
+        self.name_index = name_index
+        self.name_min_score = name_min_score
+        self.card_graph = card_graph
+        self.related_hops = related_hops
+        self.related_limit = related_limit
+        self.lexical_index = lexical_index
+        self.lexical_limit = lexical_limit
+        self.fusion_k = fusion_k
+        self.context_builder = context_builder or ContextBuilder(card_table)
 
     def extract_card_name(self, query: str) -> str:
         """Extract potential card name from query"""
@@ -54,24 +107,30 @@ class YuGiOhRecommender:
         else:
             return cleaned_query
 
-    def fallback_search(self, query: str):
-        """Fallback search strategy for when primary search fails"""
+    def retrieve_many(self, queries):
+        """Yield the retrieved documents for each query, batching them when the retriever supports it"""
+        if hasattr(self.retriever, "batch_invoke"):
+            try:
+                yield from self.retriever.batch_invoke(queries)
+                return
+            except Exception as e:
+                logger.warning(f"Batched retrieval failed, falling back to one query at a time: {e}")
+
+        for query in queries:
+            try:
+                yield self.retriever.invoke(query)
+            except Exception:
+                yield []
+
+    def fallback_queries(self, query: str):
+        """Alternative phrasings searched by fallback_search, most specific first"""
         # Extract potential card name
         card_name = self.extract_card_name(query)
 
         # Enhanced fallback with query-type specific handling
         if 'atk' in query.lower() or 'attack' in query.lower():
             # For ATK queries, use power indicators and specific ATK ranges
-            fallback_queries = [
-                "3000+ ATK High Power Monster",  # High ATK cards
-                "2500+ ATK Strong Monster",    # Strong ATK cards
-                "4000+ ATK High Power Monster", # Very high ATK cards
-                "2000+ ATK Moderate Power Monster", # Moderate ATK cards
-                query,  # Original query
-                "ATK 3000",  # Specific ATK values
-                "ATK 2500",
-                "ATK 4000"
-            ]
+            fallback_queries = ATK_FALLBACK_PHRASINGS[:4] + [query] + ATK_FALLBACK_PHRASINGS[4:]  # Original query among them
         elif 'related to' in query.lower() or 'cards related' in query.lower():
             # For "related to" queries, search for mentions in descriptions
             fallback_queries = [
@@ -99,92 +158,443 @@ class YuGiOhRecommender:
                 card_name.replace("dragon", "Dragon"),  # Capitalization fixes
                 card_name.replace(" ", ""),  # No spaces
             ]
+        return fallback_queries
+
+    def fallback_search(self, query: str):
+        """Fallback search strategy for when primary search fails"""
+        fallback_queries = self.fallback_queries(query)
+        metrics.ROUTES.inc(route="fallback")
+        metrics.FALLBACK_PHRASINGS.observe(len(fallback_queries))
+        metrics.annotate(route="fallback", fallback_phrasings=len(fallback_queries))
+
+        start = time.perf_counter()
+        with metrics.stage("fallback_search"):
+            rankings = list(self.retrieve_many(fallback_queries))
+            # Exact names, archetypes and effect keywords come straight from the lexical index
+            lexical = self.lexical_search(query)
+
+            logger.info(
+                f"Fallback search fused {len(rankings)} phrasings{' and BM25' if lexical else ''} "
+                f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+            )
+
+            # Phrasings are fused among themselves first, so nine dense lists do not outvote the one lexical list
+            return self.fuse([self.fuse(rankings), lexical], limit=15)  # Return more unique documents
+
+    def lexical_search(self, query: str, stat_query=None):
+        """BM25 matches from the card table, restricted to the query's categorical constraints"""
+        if self.lexical_index is None or self.card_table is None:
+            return []
+
+        with metrics.stage("bm25_search"):
+            hits = self.lexical_index.search(query, limit=self.lexical_limit * 3 if stat_query else self.lexical_limit)
+        rows = [row for row, _ in hits]
+        if stat_query is not None and (stat_query.categories or stat_query.flags):
+            mask = self.card_table.mask(stat_query)
+            rows = [row for row in rows if mask[row]]
+        return self.table_documents(rows[:self.lexical_limit])
+
+    def fuse(self, rankings, limit: int = None):
+        """Merge ranked document lists with reciprocal rank fusion, one document per card"""
+        docs_by_key = {}
+        keyed = []
+        for docs in rankings:
+            keys = []
+            for doc in docs or []:
+                key = card_key(doc)
+                # The first list a card shows up in provides its document
+                docs_by_key.setdefault(key, doc)
+                keys.append(key)
+            keyed.append(list(dict.fromkeys(keys)))
+        return [docs_by_key[key] for key in reciprocal_rank_fusion(keyed, k=self.fusion_k, limit=limit)]
 
-        prioritized_docs = []
-        all_docs = []
+    def stat_search(self, query: str):
+        """Answer ATK/DEF/Level style queries with an exact filter over the card table"""
+        if self.card_table is None:
+            return None
 
-        for fallback_query in fallback_queries:
+        stat_query = self.parse_query(query)
+        if not stat_query.is_stat_query():
+            return None
+
+        indices = self.card_table.query(stat_query, limit=self.stat_limit)
+        if len(indices) == 0:
+            # Let semantic search have a go in case the constraints were misread
+            return None
+
+        return self.table_documents(indices)
+
+    def name_search(self, query: str):
+        """Go straight to the card record when the query confidently names a single card"""
+        if self.name_index is None or self.card_table is None:
+            return None
+        if 'related to' in query.lower() or 'cards related' in query.lower():
+            return None
+
+        match = self.match_card_name(query)
+        if match is None:
+            return None
+
+        row, score, name = match
+        logger.info(f"Name index matched '{name}' (score {score:.2f}), skipping vector search")
+        return self.table_documents([row])
+
+    def match_card_name(self, query: str):
+        """Look up the card named in the query, returning (row, score, name) or None"""
+        # extract_card_name stops at the first matching pattern ("what is" before "what is the effect of"),
+        # so also try whatever follows the last "of"/"about"/"to"
+        candidates = [self.extract_card_name(query)]
+        tail = re.search(r'\b(?:of|about|for|to)\s+(.+?)[?.!]*$', query.strip(), re.IGNORECASE)
+        if tail:
+            candidates.append(tail.group(1))
+
+        for candidate in candidates:
+            match = self.name_index.lookup(candidate, min_score=self.name_min_score)
+            if match is not None:
+                return match
+        return None
+
+    def related_search(self, query: str):
+        """Answer "cards related to X" from the precomputed relationship graph"""
+        if self.card_graph is None or self.name_index is None or self.card_table is None:
+            return None
+        if 'related to' not in query.lower() and 'cards related' not in query.lower():
+            return None
+
+        match = self.match_card_name(query)
+        if match is None:
+            return None
+
+        row, _, _ = match
+        related = self.card_graph.related(row, hops=self.related_hops, limit=self.related_limit)
+        if len(related) < 5 and self.related_hops < 2:
+            # Sparse neighbourhood, widen to cards two links away
+            related = self.card_graph.related(row, hops=2, limit=self.related_limit)
+        if not related:
+            return None
+
+        target = self.card_table.text['name'][row]
+        logger.info(f"Card graph found {len(related)} cards related to '{target}'")
+
+        docs = self.table_documents([row])
+        for doc, (_, relation, hop) in zip(self.table_documents([r for r, _, _ in related]), related):
+            if hop > 1:
+                description = f"indirectly related to {target} through another related card"
+            else:
+                description = RELATION_DESCRIPTIONS.get(relation, relation).format(target=target)
+            doc.page_content = f"Relation: {description}\n{doc.page_content}"
+            doc.metadata["relation"] = relation
+            docs.append(doc)
+        return docs
+
+    def table_documents(self, indices):
+        """Turn card table rows into documents for the prompt context"""
+        return [
+            Document(
+                page_content=self.card_table.render(index),
+                metadata={
+                    "id": self.card_table.text['id'][index],
+                    "name": self.card_table.text['name'][index],
+                    "source": "card_table"
+                }
+            )
+            for index in indices
+        ]
+
+    def strip_card_names(self, query: str) -> str:
+        """Blank out the card names spelled out in the query, so "Cyber Dragon" is not read as race=Dragon"""
+        if self.name_index is None:
+            return query
+        for _, start, end in self.name_index.find_names(query):
+            query = query[:start] + ' ' * (end - start) + query[end:]
+        return query
+
+    def parse_query(self, query: str):
+        """parse_stat_query over the query without the card names it mentions"""
+        return parse_stat_query(self.strip_card_names(query))
+
+    def dense_filter(self, query: str):
+        """The Chroma `where` prefilter prefiltered_search applies to the query, or None"""
+        if not hasattr(self.retriever, "batch_invoke"):
+            return None
+        return metadata_filter(self.parse_query(query))
+
+    def prefiltered_search(self, query: str):
+        """Primary search restricted with a metadata prefilter, widened again if it finds too little"""
+        where = self.dense_filter(query)
+        if where:
             try:
-                docs = self.retriever.invoke(fallback_query)
-                if docs:
-                    # Check if any doc contains the exact card name
-                    for doc in docs:
-                        if card_name.lower() in doc.page_content.lower() and doc not in prioritized_docs:
-                            prioritized_docs.append(doc)
-
-                    all_docs.extend(docs)
-                    # If we found relevant docs, break early
-                    if len(prioritized_docs) >= 3:
-                        break
-            except:
-                continue
-
-        # Combine prioritized docs with remaining docs
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_docs = []
-
-        # Add prioritized docs first
-        for doc in prioritized_docs:
-            doc_id = id(doc.page_content)
-            if doc_id not in seen:
-                seen.add(doc_id)
-                unique_docs.append(doc)
-
-        # Add remaining docs
-        for doc in all_docs:
-            doc_id = id(doc.page_content)
-            if doc_id not in seen:
-                seen.add(doc_id)
-                unique_docs.append(doc)
-
-        return unique_docs[:15]  # Return more unique documents
+                docs = self.retriever.invoke(query, where=where)
+                if len(docs) >= 2:
+                    return docs
+                logger.info(f"Prefilter {where} returned {len(docs)} docs, searching the whole collection")
+            except Exception as e:
+                logger.warning(f"Prefiltered search failed: {e}")
+
+        return self.retriever.invoke(query)
+
+    def hybrid_search(self, query: str):
+        """Dense (prefiltered) and BM25 results for the query, fused by rank"""
+        dense = self.prefiltered_search(query)
+        lexical = self.lexical_search(query, self.parse_query(query))
+        if not lexical:
+            return dense
+        return self.fuse([dense, lexical], limit=max(len(dense), self.lexical_limit))
 
     def get_recommendation(self,query:str):
-        # Primary search
-        docs = self.retriever.invoke(query)
+        with metrics.stage("get_recommendation"):
+            return self.generate(query, self.retrieve(query))
 
-        # Check if primary search found relevant results
+    async def aget_recommendation(self, query: str, executor=None):
+        """Async get_recommendation: blocking retrieval runs on the executor, the LLM call is awaited"""
+        loop = asyncio.get_running_loop()
+        # Executor threads do not inherit context variables, run in a copy so stages land in the request trace
+        context = contextvars.copy_context()
+        with metrics.stage("get_recommendation"):
+            # Embedding, Chroma and the answer cache lookup are CPU/disk bound, keep them off the event loop
+            docs = await loop.run_in_executor(executor, context.run, self.retrieve, query)
+            cached = await loop.run_in_executor(executor, context.run, self.cached_answer, query, docs)
+            if cached is not None:
+                return cached
+
+            # Context packing renders every card from the memory-mapped card table, so it runs there too
+            messages = await loop.run_in_executor(executor, context.run, self.build_messages, query, docs)
+            with metrics.stage("llm"):
+                response = await self.llm.ainvoke(messages)
+
+            if self.answer_cache is not None:
+                await loop.run_in_executor(executor, self.answer_cache.store, query, docs, response.content)
+            return response.content
+
+    def get_recommendation_stream(self, query: str):
+        """Like get_recommendation, but yields the answer in chunks as the LLM produces them"""
+        yield from self.generate_stream(query, self.retrieve(query))
+
+    def retrieve(self, query: str):
+        """Route the query to the cheapest source that can answer it and return the context documents"""
+        with metrics.stage("retrieve"):
+            docs, needs_fallback = self.primary_retrieve(query)
+
+            # If primary search fails or doesn't find relevant results, use fallback
+            if needs_fallback:
+                docs = self.fallback_search(query)
+
+        metrics.DOCS_RETRIEVED.observe(len(docs or []))
+        metrics.annotate(docs_retrieved=len(docs or []))
+        return docs
+
+    def _routed(self, route: str, docs):
+        metrics.ROUTES.inc(route=route)
+        metrics.annotate(route=route)
+        return docs
+
+    def primary_retrieve(self, query: str):
+        """Return (docs, needs_fallback) from the exact indexes or the primary hybrid search"""
+        docs = self.exact_retrieve(query)
+        if docs:
+            return docs, False
+        return self.hybrid_retrieve(query)
+
+    def exact_retrieve(self, query: str):
+        """Docs from the name, stat or related routes, or None when the query needs the dense search"""
+        # "Tell me about X" style queries resolve through the name index without embedding anything.
+        # Checked before stat filtering, so "Armed Dragon LV3" is the card, not every level 3 Dragon
+        with metrics.stage("name_search"):
+            docs = self.name_search(query)
+        if docs:
+            return self._routed("name", docs)
+
+        # Exact stat filtering replaces the ATK keyword fallback when the query has numeric constraints
+        with metrics.stage("stat_search"):
+            docs = self.stat_search(query)
+        if docs:
+            return self._routed("stat", docs)
+
+        # "Cards related to X" becomes a graph lookup instead of a burst of semantic queries
+        with metrics.stage("related_search"):
+            docs = self.related_search(query)
+        if docs:
+            return self._routed("related", docs)
+        return None
+
+    def hybrid_retrieve(self, query: str):
+        """Return (docs, needs_fallback) from the primary hybrid search"""
+        # Primary search, narrowed by attribute/race/card-type metadata when the query names them,
+        # fused with exact-term BM25 matches
+        with metrics.stage("hybrid_search"):
+            docs = self.hybrid_search(query)
+
+        # Queries naming a card were answered by name_search in exact_retrieve, and ATK/DEF constraints by
+        # stat_search, so the hybrid results only need replacing when they are too thin
         needs_fallback = False
+        reason = None
         if not docs or len(docs) < 2:
             needs_fallback = True
-        else:
-            # Check if any document contains the extracted card name
-            card_name = self.extract_card_name(query)
-            found_card_name = False
-            for doc in docs[:5]:  # Check first 5 documents
-                if card_name.lower() in doc.page_content.lower():
-                    found_card_name = True
-                    break
-            if not found_card_name:
-                needs_fallback = True
-
-            # Always use fallback for fusion material queries to ensure accuracy
-            if 'fusion material' in query.lower():
-                needs_fallback = True
-
-            # Always use fallback for ATK-based queries to ensure accuracy
-            elif 'atk' in query.lower() or 'attack' in query.lower():
-                needs_fallback = True
-
-        # If primary search fails or doesn't find relevant results, use fallback
+            reason = "few_results"
+        # Always use fallback for fusion material queries to ensure accuracy
+        elif 'fusion material' in query.lower():
+            needs_fallback = True
+            reason = "fusion_material"
+
         if needs_fallback:
-            docs = self.fallback_search(query)
+            metrics.FALLBACKS.inc(reason=reason)
+            metrics.annotate(fallback_reason=reason)
+        else:
+            self._routed("hybrid", docs)
+        return docs, needs_fallback
+
+    def retrieve_batch(self, queries, workers: int = 8):
+        """retrieve() for many queries, with the dense searches embedded and run in large shared batches.
+
+        Returns one document list or exception per query, in input order.
+        """
+        batched = hasattr(self.retriever, "prefetch")
+        results = [None] * len(queries)
+
+        def attempt(fn, index):
+            try:
+                return fn(queries[index])
+            except Exception as e:
+                return e
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # Round 1: the exact routes, which need no embedding or vector search
+                exact = list(pool.map(lambda index: attempt(self.exact_retrieve, index), range(len(queries))))
+                dense = []
+                for index, outcome in enumerate(exact):
+                    if isinstance(outcome, Exception) or outcome:
+                        results[index] = outcome
+                    else:
+                        dense.append(index)
+
+                # Round 2: the dense searches of the rest, in one batch per distinct prefilter
+                if batched and dense:
+                    by_filter = {}
+                    for index in dense:
+                        where = self.dense_filter(queries[index])
+                        by_filter.setdefault(json.dumps(where, sort_keys=True), (where, []))[1].append(queries[index])
+                    for where, texts in by_filter.values():
+                        self.retriever.prefetch(texts, where=where)
+                primary = pool.map(lambda index: attempt(self.hybrid_retrieve, index), dense)
+
+                fallback = []
+                for index, outcome in zip(dense, primary):
+                    if isinstance(outcome, Exception) or not outcome[1]:
+                        results[index] = outcome if isinstance(outcome, Exception) else outcome[0]
+                    else:
+                        fallback.append(index)
+
+                # Round 3: the fallback phrasings of all queries that need them, again in one batch
+                if batched and fallback:
+                    self.retriever.prefetch([text for index in fallback for text in self.fallback_queries(queries[index])])
+                for index, outcome in zip(fallback, pool.map(lambda index: attempt(self.fallback_search, index), fallback)):
+                    results[index] = outcome
+        finally:
+            if batched:
+                self.retriever.clear_prefetched()
+
+        for docs in results:
+            if not isinstance(docs, Exception):
+                metrics.DOCS_RETRIEVED.observe(len(docs or []))
+        return results
+
+    def get_recommendations(self, queries, retrieval_workers: int = 8, llm_workers: int = 8):
+        """get_recommendation for many queries: duplicates (after normalization) are answered once,
+        retrieval is batched and LLM calls run on a bounded pool.
+
+        Returns one answer string or exception per query, in input order.
+        """
+        unique = {}
+        for query in queries:
+            unique.setdefault(normalize_query(query), query)
+        distinct = list(unique.values())
+
+        start = time.perf_counter()
+        retrieved = self.retrieve_batch(distinct, workers=retrieval_workers)
+        logger.info(
+            f"Batch retrieval for {len(distinct)} distinct of {len(queries)} queries "
+            f"in {(time.perf_counter() - start) * 1000:.0f} ms"
+        )
+
+        def answer(pair):
+            query, docs = pair
+            if isinstance(docs, Exception):
+                return docs
+            try:
+                return self.generate(query, docs)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=llm_workers) as pool:
+            answers = dict(zip(unique, pool.map(answer, zip(distinct, retrieved))))
+        return [answers[normalize_query(query)] for query in queries]
 
-        # Combine context
+    def build_messages(self, query: str, docs):
+        """Chat messages for the LLM: system role plus the prompt filled with the card context"""
+        # Combine context: compact card lines, deduplicated and packed into the token budget
         if not docs:
             context = "No specific card information found in the database."
         else:
-            context = "\n\n".join([doc.page_content for doc in docs])
+            with metrics.stage("build_context"):
+                context, stats = self.context_builder.build(docs)
+            logger.info(
+                f"Context: {stats['cards']} cards, ~{stats['tokens']} tokens "
+                f"(saved ~{stats['tokens_saved']} of {stats['original_tokens']}, {stats['dropped']} over budget)"
+            )
+            metrics.CONTEXT_TOKENS.observe(stats['tokens'])
+        metrics.CONTEXT_CHARS.observe(len(context))
+        metrics.annotate(context_chars=len(context), context_tokens=estimate_tokens(context))
 
         # Create the prompt with context and question
         formatted_prompt = self.prompt.format(context=context, question=query)
 
-        # Get response from LLM
-        messages = [
+        return [
             SystemMessage(content="You are an expert Yu-Gi-Oh! card analyst and strategist."),
             HumanMessage(content=formatted_prompt)
         ]
 
-        response = self.llm.invoke(messages)
+    def cached_answer(self, query: str, docs):
+        if self.answer_cache is None:
+            return None
+        with metrics.stage("answer_cache_lookup"):
+            cached = self.answer_cache.lookup(query, docs)
+        result = "miss" if cached is None else "hit"
+        metrics.CACHE_REQUESTS.inc(cache="answer", result=result)
+        metrics.annotate(answer_cache=result)
+        if cached is not None:
+            logger.info("Answer cache hit, skipping LLM call")
+        return cached
+
+    def generate(self, query: str, docs) -> str:
+        """Build the prompt from the retrieved documents and ask the LLM"""
+        cached = self.cached_answer(query, docs)
+        if cached is not None:
+            return cached
+
+        # Get response from LLM
+        messages = self.build_messages(query, docs)
+        with metrics.stage("llm"):
+            response = self.llm.invoke(messages)
+
+        if self.answer_cache is not None:
+            self.answer_cache.store(query, docs, response.content)
         return response.content
+
+    def generate_stream(self, query: str, docs):
+        """Stream the LLM answer chunk by chunk; only a fully received answer is cached"""
+        cached = self.cached_answer(query, docs)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        messages = self.build_messages(query, docs)
+        with metrics.stage("llm"):
+            for chunk in self.llm.stream(messages):
+                if chunk.content:
+                    chunks.append(chunk.content)
+                    yield chunk.content
+
+        if self.answer_cache is not None:
+            self.answer_cache.store(query, docs, ''.join(chunks))
@@ -1,42 +1,330 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
 from langchain_community.document_loaders.csv_loader import CSVLoader
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.documents import Document
+from src.embedding_cache import CachedEmbeddings
+from src.parallel_embedding import ParallelEmbeddings
+from src.embedding_server import EmbeddingClient, wait_for_server
+from src.card_table import TYPE_FLAGS, NUMERIC_FIELDS
+from src.card_store import CardStore, is_card_store
+from src.card_graph import MATERIAL_PATTERN
+from src.data_loader import CARD_METADATA_COLUMNS
+from utils import metrics
+from utils.logger import get_logger
+from config.config import EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_PATH, BUILD_BATCH_SIZE, EMBEDDING_MODEL_NAME, EMBED_BATCH_SIZE, INDEX_FIELDS, EMBEDDING_SERVER_SOCKET, EMBEDDING_SERVER_CONNECT_TIMEOUT
 
 # Set environment variable to avoid tokenizer parallelism warning
 import os
+import uuid
+import hashlib
+import csv
+import json
+import time
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
 from dotenv import load_dotenv
 load_dotenv()
 
+logger = get_logger(__name__)
+
+INDEX_VERSION_FILE = "index_version.txt"
+UPSERT_BATCH_SIZE = 1000
+# Part of every content hash: bumping it makes an incremental build replace every card's vectors
+INDEX_LAYOUT = "card-v1"
+INDEX_FIELD_NAMES = ('name', 'desc', 'materials')
+
+def card_metadata(row: dict) -> dict:
+    """Typed Chroma metadata for a card row: int stats, type flags, no empty values"""
+    metadata = {}
+    for key, value in row.items():
+        if key in NUMERIC_FIELDS:
+            try:
+                metadata[key] = int(float(value))
+            except (TypeError, ValueError):
+                metadata[key] = 0
+        elif value is not None:
+            metadata[key] = str(value)
+
+    # Chroma cannot do substring matches on metadata, so store the type keywords as flags
+    card_type = metadata.get("type", "").lower()
+    for flag, keywords in TYPE_FLAGS.items():
+        metadata[flag] = any(keyword in card_type for keyword in keywords)
+    return metadata
+
+def card_field_texts(metadata: dict, desc: str, fields) -> dict:
+    """Texts embedded as extra vectors of one card, keyed by field"""
+    name = metadata.get("name", "")
+    texts = {}
+    if 'name' in fields and name:
+        texts['name'] = f"Card Name: {name}"
+    if 'desc' in fields and desc:
+        texts['desc'] = f"{name} Effect: {desc}"
+    if 'materials' in fields and metadata.get("is_fusion") and desc:
+        materials = [first or second for first, second in MATERIAL_PATTERN.findall(desc)]
+        if materials:
+            texts['materials'] = f"{name} Fusion Materials: {' + '.join(materials)}"
+    return texts
+
+def _format_id(value) -> str:
+    """Card ids come back from pandas as int or float, the CSV path sees them as '12345'"""
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def load_embedding(socket_path: str = EMBEDDING_SERVER_SOCKET):
+    """The shared embedding server's client when one is configured and answering, else the local model"""
+    if socket_path:
+        if wait_for_server(socket_path, timeout=EMBEDDING_SERVER_CONNECT_TIMEOUT):
+            client = EmbeddingClient(socket_path)
+            if client.model_name != EMBEDDING_MODEL_NAME:
+                logger.warning(f"Embedding server runs {client.model_name}, the index expects {EMBEDDING_MODEL_NAME}")
+            logger.info(f"Using the shared embedding server at {socket_path}")
+            return client
+        logger.warning(f"No embedding server at {socket_path}, loading {EMBEDDING_MODEL_NAME} in this process")
+
+    # Imported here so processes served by the embedding server never load torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name = EMBEDDING_MODEL_NAME)
+
 class VectorStoreBuilder:
-    def __init__(self,csv_path:str,persist_dir:str="chroma_db"):
+    def __init__(self,csv_path:str,persist_dir:str="chroma_db",embedding_cache_size:int=EMBEDDING_CACHE_SIZE,embedding_cache_path:str=EMBEDDING_CACHE_PATH,workers:int=1,embed_batch_size:int=EMBED_BATCH_SIZE,index_fields=INDEX_FIELDS,embedding=None):
         self.csv_path = csv_path
         self.persist_dir = persist_dir
-        self.embedding = HuggingFaceEmbeddings(model_name = "all-MiniLM-L6-v2")
-    
-    def build_and_save_vectorstore(self):
-        loader = CSVLoader(
-            file_path=self.csv_path,
-            encoding='utf-8',
-            metadata_columns=[]
+        unknown = set(index_fields) - set(INDEX_FIELD_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown index fields {sorted(unknown)}, expected any of {INDEX_FIELD_NAMES}")
+        self.index_fields = tuple(field for field in INDEX_FIELD_NAMES if field in index_fields)
+        # Any LangChain Embeddings can stand in for the local model (e.g. deterministic ones for offline runs)
+        self.embedding = embedding or load_embedding()
+        # Builds can shard embedding across a process pool; serving always uses the in-process model.
+        # With the embedding server the model already runs elsewhere, so there is nothing to shard
+        self.build_embedding = (
+            ParallelEmbeddings(EMBEDDING_MODEL_NAME, workers=workers, batch_size=embed_batch_size)
+            if workers > 1 and not isinstance(self.embedding, EmbeddingClient) else self.embedding
         )
+        # Query-time embeddings go through an LRU (+ optional disk) cache; builds use the raw model
+        self.query_embedding = CachedEmbeddings(
+            self.embedding,
+            max_size=embedding_cache_size,
+            cache_path=embedding_cache_path
+        )
+    
+    def build_and_save_vectorstore(self, incremental: bool = True):
+        """Build the card index from the processed cards; incremental mode only embeds new or changed cards"""
+        with metrics.stage("build_load"):
+            if is_card_store(self.csv_path):
+                data = self._load_store_documents()
+            else:
+                with open(self.csv_path, encoding='utf-8') as f:
+                    header = next(csv.reader(f))
 
-        data = loader.load()
+                loader = CSVLoader(
+                    file_path=self.csv_path,
+                    encoding='utf-8',
+                    metadata_columns=[column for column in CARD_METADATA_COLUMNS + ['desc'] if column in header],
+                    content_columns=["combined_info"]
+                )
 
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,  # Smaller chunks for better context preservation
-            chunk_overlap=200,  # Add overlap to maintain context between chunks
-            separators=["\n\n", "\n", " ", ""]  # Better separators for card data
-        )
-        texts = splitter.split_documents(data)
+                data = loader.load()
+
+        cards = {}
+        with metrics.stage("build_prepare"):
+            for doc in data:
+                card_id, fields = self._prepare_card(doc)
+                cards[card_id] = (doc, fields)
+        metrics.ITEMS.inc(len(cards), kind="cards_indexed")
+
+        db = self._open_for_build(incremental)
+        existing, legacy_ids = self._indexed_cards(db)
+        self._delete_legacy(db, legacy_ids)
+
+        card_ids = list(cards)
+        changed = 0
+        for start in range(0, len(card_ids), UPSERT_BATCH_SIZE):
+            batch = {card_id: cards[card_id] for card_id in card_ids[start:start + UPSERT_BATCH_SIZE]}
+            changed += self._index_batch(db, batch, existing)
+
+        removed = self._delete_removed(db, existing, cards)
+
+        print(f"Indexed {len(cards)} cards: {changed} new or changed, "
+              f"{removed} removed, {len(cards) - changed} unchanged")
+
+        if changed or removed or legacy_ids:
+            self.write_index_version()
+
+    def build_streaming(self, data_loader, batch_size: int = BUILD_BATCH_SIZE, incremental: bool = True, on_chunk=None):
+        """Stream the raw card CSV straight into the index, holding at most one batch of cards in memory.
+
+        on_chunk, if given, receives every cleaned batch first, so other tables can be built from the same pass.
+        """
+        db = self._open_for_build(incremental)
+        # Only card_id -> content_hash is kept for the whole run, never documents or vectors
+        existing, legacy_ids = self._indexed_cards(db)
+        self._delete_legacy(db, legacy_ids)
+
+        seen = set()
+        total = changed = 0
+        start_time = time.perf_counter()
 
-        db = Chroma.from_documents(texts,self.embedding,persist_directory=self.persist_dir)
+        for df in data_loader.iter_clean_chunks(batch_size):
+            if on_chunk is not None:
+                on_chunk(df)
+            with metrics.stage("build_prepare"):
+                df['combined_info'] = data_loader.build_combined_info(df)
+                df = df[df['combined_info'].str.len() > 20]
+
+                columns = [column for column in CARD_METADATA_COLUMNS + ['desc'] if column in df.columns]
+                batch = {}
+                for doc in self._documents(df[columns + ['combined_info']].to_dict('records')):
+                    card_id, fields = self._prepare_card(doc)
+                    batch[card_id] = (doc, fields)
+            metrics.ITEMS.inc(len(batch), kind="cards_indexed")
+
+            changed += self._index_batch(db, batch, existing)
+            seen.update(batch)
+            total += len(batch)
+
+            elapsed = time.perf_counter() - start_time
+            print(f"Processed {total} cards ({changed} embedded) - {total / elapsed:,.0f} cards/s")
+
+        removed = self._delete_removed(db, existing, seen)
+
+        elapsed = time.perf_counter() - start_time
+        print(f"Streamed {total} cards in {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} cards/s): "
+              f"{changed} new or changed, {removed} removed, {total - changed} unchanged")
+
+        if changed or removed or legacy_ids:
+            self.write_index_version()
+
+    def _documents(self, records):
+        for record in records:
+            if 'id' in record:
+                record['id'] = _format_id(record['id'])
+            # Same page_content CSVLoader produces for the processed CSV
+            yield Document(page_content=f"combined_info: {record.pop('combined_info').strip()}", metadata=record)
+
+    def _load_store_documents(self):
+        """Processed card store rows as Documents, typed columns instead of re-parsed CSV text"""
+        store = CardStore(self.csv_path)
+        columns = [column for column in CARD_METADATA_COLUMNS + ['desc'] if column in store.columns] + ['combined_info']
+        return list(self._documents(store.iter_records(columns)))
+
+    def _prepare_card(self, doc: Document):
+        """Type the metadata and stamp the stable card id and content hash; returns (card id, field texts)"""
+        # The CSV row number shifts whenever a card is added and the source path depends on the
+        # build mode, neither may affect the hash
+        doc.metadata.pop("row", None)
+        doc.metadata.pop("source", None)
+        # The effect text is already in page_content, it only feeds the field vectors
+        desc = doc.metadata.pop("desc", None) or ""
+        doc.metadata = card_metadata(doc.metadata)
+        fields = card_field_texts(doc.metadata, desc, self.index_fields)
+        hashed = INDEX_LAYOUT + doc.page_content + json.dumps(doc.metadata, sort_keys=True) + json.dumps(fields, sort_keys=True)
+        content_hash = hashlib.sha256(hashed.encode("utf-8")).hexdigest()
+        card_id = doc.metadata.pop("id", "") or content_hash
+        doc.metadata["card_id"] = card_id
+        doc.metadata["content_hash"] = content_hash
+        return card_id, fields
+
+    def _open_for_build(self, incremental: bool):
+        db = Chroma(persist_directory=self.persist_dir, embedding_function=self.build_embedding)
+        if not incremental:
+            db.reset_collection()
+        return db
+
+    def _index_batch(self, db, cards: dict, existing: dict) -> int:
+        """Embed and upsert the new or changed cards of one batch; returns how many were embedded"""
+        changed = [card_id for card_id, (doc, _) in cards.items()
+                   if existing.get(card_id) != doc.metadata["content_hash"]]
+        if not changed:
+            return 0
+
+        stale = [card_id for card_id in changed if card_id in existing]
+        if stale:
+            with metrics.stage("build_delete"):
+                db.delete(where={"card_id": {"$in": stale}})
+
+        # One entry per card (id = card id). Optional field vectors ("<card id>:<field>") embed only
+        # that field but store the whole card, so any hit returns the full card and groups back to it
+        ids, texts, documents, metadatas = [], [], [], []
+        for card_id in changed:
+            doc, fields = cards[card_id]
+            for field, text in [("card", doc.page_content)] + list(fields.items()):
+                ids.append(card_id if field == "card" else f"{card_id}:{field}")
+                texts.append(text)
+                documents.append(doc.page_content)
+                metadatas.append({**doc.metadata, "field": field})
+
+        # Upserts by id, so re-running never appends duplicates
+        for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+            end = start + UPSERT_BATCH_SIZE
+            with metrics.stage("build_embed"):
+                embeddings = self.build_embedding.embed_documents(texts[start:end])
+            with metrics.stage("build_upsert"):
+                db._collection.upsert(
+                    ids=ids[start:end],
+                    embeddings=embeddings,
+                    documents=documents[start:end],
+                    metadatas=metadatas[start:end]
+                )
         # ChromaDB automatically persists when persist_directory is specified
 
+        metrics.ITEMS.inc(len(changed), kind="cards_embedded")
+        metrics.ITEMS.inc(len(ids), kind="vectors_embedded")
+        return len(changed)
+
+    def _delete_removed(self, db, existing: dict, current) -> int:
+        removed = [card_id for card_id in existing if card_id not in current]
+        with metrics.stage("build_delete"):
+            for start in range(0, len(removed), UPSERT_BATCH_SIZE):
+                db.delete(where={"card_id": {"$in": removed[start:start + UPSERT_BATCH_SIZE]}})
+        metrics.ITEMS.inc(len(removed), kind="cards_removed")
+        return len(removed)
+
+    def _delete_legacy(self, db, legacy_ids):
+        # Chunks written before cards had stable ids cannot be matched, replace them
+        for start in range(0, len(legacy_ids), UPSERT_BATCH_SIZE):
+            db.delete(ids=legacy_ids[start:start + UPSERT_BATCH_SIZE])
+
+    def _indexed_cards(self, db):
+        """Return (card_id -> content_hash, ids of chunks without a card_id) for the persisted index"""
+        existing = {}
+        legacy_ids = []
+        offset = 0
+        while True:
+            page = db.get(include=["metadatas"], limit=UPSERT_BATCH_SIZE, offset=offset)
+            if not page["ids"]:
+                break
+            for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+                metadata = metadata or {}
+                if "card_id" in metadata:
+                    existing[metadata["card_id"]] = metadata.get("content_hash")
+                else:
+                    legacy_ids.append(doc_id)
+            offset += len(page["ids"])
+        return existing, legacy_ids
+
+    def close(self):
+        """Shut down the embedding worker pool, if one was started"""
+        if isinstance(self.build_embedding, ParallelEmbeddings):
+            self.build_embedding.close()
+
+    def write_index_version(self):
+        """Stamp the persisted index so serving processes can drop caches built on the old one"""
+        os.makedirs(self.persist_dir, exist_ok=True)
+        with open(os.path.join(self.persist_dir, INDEX_VERSION_FILE), "w", encoding="utf-8") as f:
+            f.write(uuid.uuid4().hex)
+
+    def index_version(self):
+        try:
+            with open(os.path.join(self.persist_dir, INDEX_VERSION_FILE), encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
     def load_vector_store(self):
-        return Chroma(persist_directory=self.persist_dir,embedding_function=self.embedding)
+        return Chroma(persist_directory=self.persist_dir,embedding_function=self.query_embedding)
 
 
 
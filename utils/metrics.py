@@ -0,0 +1,281 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+# Seconds; wide enough for a 5 ms cache hit and a 30 s index batch
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (0, 1, 2, 5, 10, 15, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def _label_text(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels.get(name, "") for name in self.labels), 0)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_label_text(self.labels, key)} {value:g}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def count(self, **labels) -> int:
+        counts = self._values.get(tuple(labels.get(name, "") for name in self.labels))
+        return counts[-2] if counts else 0
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, counts in sorted(self._values.items()):
+            for bound, count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket{_label_text(self.labels + ('le',), key + (f'{bound:g}',))} {count}"
+            yield f"{self.name}_bucket{_label_text(self.labels + ('le',), key + ('+Inf',))} {counts[-2]}"
+            yield f"{self.name}_sum{_label_text(self.labels, key)} {counts[-1]:g}"
+            yield f"{self.name}_count{_label_text(self.labels, key)} {counts[-2]}"
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms, rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "yugioh_stage_seconds", "Time spent in each recommendation, build and scrape stage", ("stage",))
+STAGE_ERRORS = REGISTRY.counter(
+    "yugioh_stage_errors_total", "Stages that raised an exception", ("stage",))
+ROUTES = REGISTRY.counter(
+    "yugioh_route_total", "Queries answered by each retrieval route", ("route",))
+FALLBACKS = REGISTRY.counter(
+    "yugioh_fallback_total", "Fallback searches by the reason they were triggered", ("reason",))
+FALLBACK_PHRASINGS = REGISTRY.histogram(
+    "yugioh_fallback_phrasings", "Phrasings searched per fallback search", buckets=SIZE_BUCKETS)
+DOCS_RETRIEVED = REGISTRY.histogram(
+    "yugioh_docs_retrieved", "Documents retrieved per query", buckets=SIZE_BUCKETS)
+CONTEXT_CHARS = REGISTRY.histogram(
+    "yugioh_context_chars", "Characters of card context sent to the LLM",
+    buckets=(500, 1000, 2000, 4000, 6000, 8000, 12000, 16000, 32000))
+CONTEXT_TOKENS = REGISTRY.histogram(
+    "yugioh_context_tokens", "Estimated tokens of card context sent to the LLM",
+    buckets=(100, 250, 500, 1000, 1500, 2000, 3000, 4000, 8000))
+CACHE_REQUESTS = REGISTRY.counter(
+    "yugioh_cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+ITEMS = REGISTRY.counter(
+    "yugioh_items_total", "Cards and pages processed by builds and scrapes", ("kind",))
+
+
+_current_trace = contextvars.ContextVar("yugioh_trace", default=None)
+_trace_file_lock = threading.Lock()
+
+
+class Trace:
+    """Stage spans and attributes recorded for one request"""
+
+    def __init__(self, name: str, **attrs):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.attrs = dict(attrs)
+        self.spans = []
+        self._start = time.perf_counter()
+        self.started_at = time.time()
+        self.duration_ms = None
+
+    def add_span(self, stage: str, start: float, seconds: float, error: str = None):
+        span = {"stage": stage, "start_ms": round((start - self._start) * 1000, 2), "ms": round(seconds * 1000, 2)}
+        if error:
+            span["error"] = error
+        self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "attrs": self.attrs,
+            "spans": self.spans,
+        }
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """Time a block: observed in yugioh_stage_seconds and added as a span to the current trace, if any"""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=name)
+        current = _current_trace.get()
+        if current is not None:
+            current.add_span(name, start, seconds, error)
+
+
+def annotate(**attrs):
+    """Attach attributes (route, fallback reason, sizes...) to the current trace, if any"""
+    current = _current_trace.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+@contextlib.contextmanager
+def trace(name: str, path: str = None, **attrs):
+    """Collect the stages of one request into a Trace; with a path it is appended there as a JSON line.
+
+    Inside an active trace this is just a stage of it, so callers can wrap a pipeline that traces itself.
+    """
+    outer = _current_trace.get()
+    if outer is not None:
+        outer.attrs.update(attrs)
+        with stage(name):
+            yield outer
+        return
+
+    current = Trace(name, **attrs)
+    token = _current_trace.set(current)
+    try:
+        with stage(name):
+            yield current
+    finally:
+        _current_trace.reset(token)
+        _finish_trace(current, path)
+
+
+def _finish_trace(current: Trace, path: str = None):
+    current.duration_ms = round((time.perf_counter() - current._start) * 1000, 2)
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        line = json.dumps(current.to_dict(), default=str)
+        with _trace_file_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def traced(name: str, iterable, path: str = None, **attrs):
+    """trace() for a generator: yields its items with the trace active only while the generator runs.
+
+    A `with trace(...)` around `yield` would leave the trace set in the consumer's context while the
+    generator is suspended, and closing an abandoned generator from another context could not reset it.
+    Here the generator is stepped inside a private copy of the context instead.
+    """
+    context = contextvars.copy_context()
+    outer = context.get(_current_trace)
+    if outer is not None:
+        outer.attrs.update(attrs)
+        current = outer
+    else:
+        current = Trace(name, **attrs)
+        context.run(_current_trace.set, current)
+
+    iterator = iter(iterable)
+    start = time.perf_counter()
+    error = None
+    try:
+        while True:
+            try:
+                item = context.run(next, iterator)
+            except StopIteration:
+                return
+            yield item
+    except GeneratorExit:
+        # The consumer stopped reading; not a failure of the stage
+        current.attrs["abandoned"] = True
+        raise
+    except BaseException as e:
+        error = type(e).__name__
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        if hasattr(iterator, "close"):
+            context.run(iterator.close)
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=name)
+        current.add_span(name, start, seconds, error)
+        if outer is None:
+            _finish_trace(current, path)
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+def stage_totals() -> dict:
+    """{stage: (calls, total seconds)} for every stage timed so far in this process"""
+    return {key[0]: (counts[-2], counts[-1]) for key, counts in sorted(STAGE_SECONDS._values.items())}
+
+
+def log_stage_totals(logger):
+    for name, (calls, seconds) in stage_totals().items():
+        logger.info(f"Stage {name}: {calls} calls, {seconds:.2f}s total")
+
+
+def write_textfile(path: str):
+    """Write the current metrics for a batch job (node_exporter textfile collector format), atomically"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    part_path = f"{path}.part"
+    with open(part_path, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(part_path, path)